@@ -0,0 +1,57 @@
+#!/usr/bin/python
+
+"""Compare `type_casting.encode_json` with `json.dumps(dataclasses.asdict(x))`.
+
+PYTHONPATH=. python benchmarks/encode_json.py
+"""
+
+import dataclasses
+import json
+import timeit
+import typing
+
+import type_casting
+
+
+@dataclasses.dataclass
+class Point:
+    x: float
+    y: float
+
+
+@dataclasses.dataclass
+class Shape:
+    name: str
+    kind: typing.Literal["polygon", "line"]
+    points: list[Point]
+    tags: dict[str, int]
+    parent: typing.Optional[str] = None
+
+
+def main():
+    shapes = [
+        Shape(
+            name=f"shape{i}",
+            kind="polygon",
+            points=[Point(float(j), j / 3) for j in range(20)],
+            tags=dict(a=i, b=2 * i),
+        )
+        for i in range(100)
+    ]
+
+    def asdict():
+        return json.dumps(
+            [dataclasses.asdict(shape) for shape in shapes], separators=(",", ":")
+        ).encode()
+
+    def encode_json():
+        return type_casting.encode_json(list[Shape], shapes)
+
+    assert asdict() == encode_json()
+    for f in (asdict, encode_json):
+        n, t = timeit.Timer(f).autorange()
+        print(f"{f.__name__}\t{t / n * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/python
+
+"""Measure `Caster.parallel` on a large `list[Record]` with thread pools of increasing sizes.
+
+    PYTHONPATH=. python benchmarks/parallel_cast.py
+
+The chunks are cast in parallel only on free-threaded builds of CPython with the GIL disabled.
+"""
+
+import concurrent.futures
+import dataclasses
+import os
+import sys
+import timeit
+
+import type_casting
+
+
+@dataclasses.dataclass
+class Record:
+    id: int
+    name: str
+    scores: list[float]
+    tags: dict[str, str]
+
+
+def main():
+    xs = [
+        dict(id=i, name=f"r{i}", scores=[i / 7, 1.0, 2.5], tags=dict(k=str(i)))
+        for i in range(200_000)
+    ]
+    caster = type_casting.compile(list[Record])
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"{sys.version.split()[0]}\tGIL {'enabled' if gil else 'disabled'}")
+    n, t = timeit.Timer(lambda: caster(xs)).autorange()
+    print(f"sequential\t{t / n * 1e3:.1f} ms")
+    for workers in (1, 2, 4, 8, 16):
+        if workers > (os.cpu_count() or 1):
+            break
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            n, t = timeit.Timer(
+                lambda: caster.parallel(
+                    xs, executor, chunksize=len(xs) // (4 * workers)
+                )
+            ).autorange()
+        print(f"{workers} threads\t{t / n * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
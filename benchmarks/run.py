@@ -0,0 +1,183 @@
+#!/usr/bin/python
+
+"""Benchmarks of the analysis and the casting hot paths.
+
+    PYTHONPATH=. python benchmarks/run.py -o results.json
+    PYTHONPATH=. python benchmarks/run.py -o new.json --compare results.json
+
+Each case is timed with `timeit` for a cold analysis and for `cast` of lists of `--sizes`
+payloads, using only the API of past releases so that their results are comparable.
+Where `compile` is available, the cast by a compiled caster is timed as well.
+The cases that the version under test does not support are skipped.
+The results file holds the seconds per call of each benchmark, keyed by its name.
+"""
+
+import argparse
+import collections
+import dataclasses
+import decimal
+import json
+import platform
+import sys
+import timeit
+import typing
+
+import type_casting
+
+
+@dataclasses.dataclass
+class Point:
+    x: float
+    y: float
+
+
+@dataclasses.dataclass
+class Segment:
+    start: Point
+    end: Point
+    label: typing.Optional[str] = None
+
+
+@dataclasses.dataclass
+class Drawing:
+    name: str
+    segments: list[Segment]
+    layers: dict[str, tuple[int, ...]]
+
+
+class Order(typing.TypedDict):
+    id: int
+    symbol: str
+    side: typing.Literal["buy", "sell"]
+    quantity: int
+
+
+def _make_variant(i):
+    @dataclasses.dataclass
+    class Variant:
+        kind: typing.Literal[f"v{i}"]
+        value: int
+
+    Variant.__qualname__ = f"Variant{i}"
+    return Variant
+
+
+_variants = tuple(_make_variant(i) for i in range(16))
+WideUnion = typing.Union[_variants]
+
+
+@dataclasses.dataclass
+class Price:
+    amount: decimal.Decimal
+    currency: typing.Literal["USD", "EUR", "JPY"]
+
+
+@dataclasses.dataclass
+class Containers:
+    queue: collections.deque[int]
+    ids: set[str]
+    counts: dict[str, int]
+
+
+def make_point(x: float, y: float) -> Point:
+    return Point(x, y)
+
+
+_point = dict(x=1.0, y=2.5)
+
+CASES = dict(
+    nested_dataclass=(
+        Drawing,
+        dict(
+            name="d",
+            segments=[dict(start=_point, end=_point, label="s")] * 4,
+            layers=dict(a=[1, 2], b=[3]),
+        ),
+    ),
+    typeddict=(Order, dict(id=1, symbol="ABC", side="buy", quantity=100)),
+    wide_union=(WideUnion, dict(kind="v15", value=1)),
+    literal=(typing.Literal["buy", "sell"], "sell"),
+    decimal=(Price, dict(amount="12.34", currency="JPY")),
+    containers=(
+        Containers,
+        dict(queue=[1, 2, 3], ids=["a", "b"], counts=dict(a=1, b=2)),
+    ),
+    call=(
+        type_casting.Call[typing.Literal[f"{__name__}.make_point"]],
+        dict(fn=f"{__name__}.make_point", kwargs=_point),
+    ),
+)
+
+
+def bench(f):
+    n, t = timeit.Timer(f).autorange()
+    return t / n
+
+
+def run(sizes):
+    compile = getattr(type_casting, "compile", None)
+    # Releases without the cache of plans analyze on every call.
+    clear = getattr(type_casting, "cast_cache_clear", lambda: None)
+    results = {}
+    for name, (cls, x) in CASES.items():
+        try:
+            type_casting.cast(list[cls], [x])
+        except Exception as e:
+            print(f"skipping {name}, unsupported: {e!r}", file=sys.stderr)
+            continue
+        results[f"{name}.analyze"] = bench(lambda: (clear(), type_casting.cast(cls, x)))
+        caster = compile and compile(list[cls])
+        for size in sizes:
+            xs = [x] * size
+            results[f"{name}.cast.{size}"] = bench(
+                lambda: type_casting.cast(list[cls], xs)
+            )
+            if caster is not None:
+                results[f"{name}.compiled.{size}"] = bench(lambda: caster(xs))
+    for size in sizes:
+        overrides = [f"a.b{i}.c=[{i}, 2]" for i in range(size)]
+        results[f"override.{size}"] = bench(
+            lambda: type_casting.override(dict(a={}), overrides)
+        )
+    return results
+
+
+def compare(results, baseline):
+    print(f"{'benchmark':<32}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for name, t in results.items():
+        if name in baseline:
+            t0 = baseline[name]
+            print(f"{name:<32}{t0 * 1e6:>10.2f}us{t * 1e6:>10.2f}us{t / t0:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="a results file to compare with")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1, 100, 10000], help="payload sizes"
+    )
+    args = parser.parse_args()
+    results = run(args.sizes)
+    if args.compare:
+        with open(args.compare) as fp:
+            compare(results, json.load(fp)["results"])
+    else:
+        for name, t in results.items():
+            print(f"{name:<32}{t * 1e6:>10.2f}us")
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(
+                dict(
+                    version=type_casting.__version__,
+                    python=sys.version,
+                    platform=platform.platform(),
+                    results=results,
+                ),
+                fp,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,28 @@
+import __future__
+import array
+import builtins
 import collections
+import concurrent.futures
 import dataclasses
 import decimal
+import enum
+import functools
+import io
+import json
+import pickle
+import sys
+import types
 import typing
 import unittest
+import unittest.mock
 
 import type_casting
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class Recording:
     def __init__(self, *args, **kwargs):
@@ -28,6 +45,12 @@ def positional_only(x: int, /):
     return x
 
 
+@dataclasses.dataclass
+class _Point:
+    x: int
+    y: decimal.Decimal
+
+
 class Tester(unittest.TestCase):
     def test_override(self):
         self.assertEqual(
@@ -47,6 +70,59 @@ class Tester(unittest.TestCase):
         with self.assertRaises(AttributeError):
             type_casting.cast(type_casting.GetAttr[str], "type_casting.no_such_attr")
 
+    def test_getattr_with_import(self):
+        sys.modules.pop("colorsys", None)
+        with self.assertRaises(KeyError):
+            type_casting.cast(type_casting.GetAttr[str], "colorsys.rgb_to_hsv")
+        rgb_to_hsv = type_casting.cast(
+            type_casting.GetAttr[str], "colorsys.rgb_to_hsv", import_modules=True
+        )
+        self.assertIs(sys.modules["colorsys"].rgb_to_hsv, rgb_to_hsv)
+        self.assertIs(
+            rgb_to_hsv,
+            type_casting.cast(type_casting.GetAttr[str], "colorsys.rgb_to_hsv"),
+        )
+        sys.modules.pop("colorsys")
+        self.assertIsNot(
+            rgb_to_hsv,
+            type_casting.cast(
+                type_casting.GetAttr[str], "colorsys.rgb_to_hsv", import_modules=True
+            ),
+        )
+        self.assertIs(
+            type_casting.Call,
+            type_casting.cast(
+                type_casting.GetAttr[str], "type_casting.Call", import_modules=True
+            ),
+        )
+        with self.assertRaises(KeyError):
+            type_casting.cast(type_casting.GetAttr[str], "", import_modules=True)
+        with self.assertRaises(KeyError):
+            type_casting.cast(
+                type_casting.GetAttr[str], "no_such_module.x", import_modules=True
+            )
+        with self.assertRaises(AttributeError):
+            type_casting.cast(
+                type_casting.GetAttr[str], "colorsys.no_such_attr", import_modules=True
+            )
+        t = type_casting.GetAttr[str]
+        with unittest.mock.patch("colorsys.rgb_to_hsv") as patched:
+            self.assertIs(patched, type_casting.cast(t, "colorsys.rgb_to_hsv"))
+        self.assertIs(
+            sys.modules["colorsys"].rgb_to_hsv,
+            type_casting.cast(t, "colorsys.rgb_to_hsv"),
+        )
+        resolved = type_casting._common._resolved
+        type_casting.cast_cache_clear()
+        with unittest.mock.patch.object(type_casting._common, "_max_resolved", 2):
+            for name in ("rgb_to_hls", "rgb_to_yiq", "hsv_to_rgb"):
+                type_casting.cast(t, f"colorsys.{name}")
+            self.assertEqual(2, len(resolved))
+            self.assertIn(("colorsys.hsv_to_rgb", False), resolved)
+        type_casting.cast(t, "colorsys.rgb_to_hsv")
+        type_casting.cast_cache_clear()
+        self.assertEqual(0, len(resolved))
+
     def test_nested(self):
         @dataclasses.dataclass
         class c:
@@ -401,3 +477,1079 @@ class Tester(unittest.TestCase):
         )
         with self.assertRaises(type_casting.CastingError):
             type_casting.cast(td2, dict(p=dict(x=1)))
+
+    def test_compile(self):
+        @dataclasses.dataclass
+        class c:
+            x: int
+            y: list[decimal.Decimal]
+
+        caster = type_casting.compile(c)
+        self.assertEqual(c(1, [decimal.Decimal("2.5")]), caster(dict(x=1, y=["2.5"])))
+        self.assertEqual(c(2, []), caster(dict(x=2, y=[])))
+        with self.assertRaises(type_casting.CastingError):
+            caster(dict(x="1", y=[]))
+
+    def test_cast_cache(self):
+        @dataclasses.dataclass
+        class c:
+            x: int
+
+        type_casting.cast_cache_clear()
+        type_casting.cast(c, dict(x=1))
+        type_casting.cast(c, dict(x=2))
+        type_casting.cast(c, dict(x=3), implicit_conversions={int: int})
+        info = type_casting.cast_cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 2, 2))
+        type_casting.cast_cache_clear()
+        self.assertEqual(type_casting.cast_cache_info().currsize, 0)
+        cache = type_casting._common._PlanCache(maxsize=2)
+        for key in "aba":
+            cache.get(key, lambda: key)
+        cache.get("c", lambda: "c")
+        self.assertEqual("a", cache.get("a", lambda: "new"))
+        self.assertEqual("new", cache.get("b", lambda: "new"))
+        self.assertEqual((2, 4, 2), cache.info()[:3])
+
+    def test_cast_cache_unhashable_conversion(self):
+        @dataclasses.dataclass
+        class Scale:
+            factor: int
+
+            def __call__(self, x):
+                return x * self.factor
+
+        type_casting.cast_cache_clear()
+        for _ in range(2):
+            self.assertEqual(
+                [10, 20], type_casting.cast(list[int], [1, 2], {int: Scale(10)})
+            )
+        self.assertEqual(0, type_casting.cast_cache_info().currsize)
+
+    def test_cast_cache_union_order(self):
+        x = "1.5"
+        for _ in range(2):
+            self.assertEqual(x, type_casting.cast(str | decimal.Decimal, x))
+            self.assertEqual(
+                decimal.Decimal(x), type_casting.cast(decimal.Decimal | str, x)
+            )
+            self.assertEqual(
+                [decimal.Decimal(x)],
+                type_casting.cast(list[typing.Union[decimal.Decimal, str]], [x]),
+            )
+            self.assertEqual(
+                [x], type_casting.cast(list[typing.Union[str, decimal.Decimal]], [x])
+            )
+
+    def test_codegen_backend(self):
+        @dataclasses.dataclass
+        class c2:
+            x: typing.Literal["xx"]
+            y: float = 1.0
+
+        class td(typing.TypedDict, total=False):
+            p: c2
+            q: str
+
+        @dataclasses.dataclass
+        class c1:
+            a: int
+            b: typing.Any
+            c: list[c2 | td]
+            d: complex
+
+        caster = type_casting.compile(c1, backend="codegen")
+        x = dict(a=1, b=[2], c=[dict(x="xx"), dict(p=dict(x="xx", y=2), q="q")], d=3j)
+        self.assertEqual(type_casting.compile(c1)(x), caster(x))
+        self.assertEqual(
+            c1(1, [2], [c2("xx"), dict(p=c2("xx", 2), q="q")], 3j), caster(x)
+        )
+        for invalid in [
+            [],
+            dict(a=1, b=2, c=[]),
+            dict(a=1, b=2, c=[], d=3, e=4),
+            dict(a=1.0, b=2, c=[], d=3),
+            dict(a=1, b=2, c=[dict(x="yy")], d=3),
+            dict(a=1, b=2, c=[], d="3"),
+        ]:
+            with self.assertRaises(type_casting.CastingError) as expected:
+                type_casting.compile(c1)(invalid)
+            with self.assertRaises(type_casting.CastingError) as actual:
+                caster(invalid)
+            self.assertEqual(str(expected.exception), str(actual.exception))
+        with self.assertRaises(ValueError):
+            type_casting.compile(c1, backend="no_such_backend")
+
+    def test_codegen_backend_order(self):
+        class td(typing.TypedDict, total=False):
+            a: int
+            b: decimal.Decimal
+            c: int
+
+        @dataclasses.dataclass
+        class c:
+            a: int
+            b: decimal.Decimal
+            c: int = 0
+
+        invalid = dict(c="1", b=[], a="1")
+        for t in (td, c):
+            paths = []
+            for backend in ("partial", "codegen"):
+                caster = type_casting.compile(t, backend=backend)
+                with self.assertRaises(type_casting.CastingError) as e:
+                    caster(invalid)
+                paths.append(e.exception.path)
+            self.assertEqual([("a",), ("a",)], paths)
+        for backend in ("partial", "codegen"):
+            calls = []
+            caster = type_casting.compile(
+                td, {int: calls.append, decimal.Decimal: calls.append}, backend=backend
+            )
+            self.assertEqual(["a", "b", "c"], list(caster(dict(c=1, b=2, a=3))))
+            self.assertEqual([3, 2, 1], calls)
+        self.assertEqual(
+            ["a", "b", "c"],
+            list(
+                type_casting.cast_json_stream(td, io.StringIO('{"c":1,"b":"2","a":3}'))
+            ),
+        )
+
+    def test_tagged_union(self):
+        @dataclasses.dataclass
+        class Adam:
+            name: typing.Literal["Adam"]
+            learning_rate: float
+
+        @dataclasses.dataclass
+        class SGD:
+            name: typing.Literal["SGD", "sgd"]
+            learning_rate: float
+
+        class Other(typing.TypedDict):
+            name: str
+
+        t = typing.Union[Adam, SGD, Other, str]
+        self.assertEqual(
+            SGD("sgd", 1), type_casting.cast(t, dict(name="sgd", learning_rate=1))
+        )
+        self.assertEqual(
+            Adam("Adam", 1), type_casting.cast(t, dict(name="Adam", learning_rate=1))
+        )
+        self.assertEqual(dict(name="SGD"), type_casting.cast(t, dict(name="SGD")))
+        self.assertEqual(dict(name="x"), type_casting.cast(t, dict(name="x")))
+        self.assertEqual("Adam", type_casting.cast(t, "Adam"))
+        with self.assertRaises(type_casting.CastingError):
+            type_casting.cast(t, dict(name=["Adam"], learning_rate=1))
+        with self.assertRaises(type_casting.CastingError):
+            type_casting.cast(Adam | SGD, dict(learning_rate=1))
+
+    def test_union_screening(self):
+        @dataclasses.dataclass
+        class c:
+            x: int
+
+        class td1(typing.TypedDict):
+            a: int
+
+        class td2(typing.TypedDict, total=False):
+            a: str
+            b: int
+
+        self.assertIsNone(type_casting.cast(typing.Optional[c], None))
+        self.assertEqual(c(1), type_casting.cast(typing.Optional[c], dict(x=1)))
+        self.assertEqual("a", type_casting.cast(dict[str, int] | str, "a"))
+        self.assertEqual(["a"], type_casting.cast(c | list[str], ["a"]))
+        t = typing.Union[td1, td2, c]
+        self.assertEqual(dict(a=1), type_casting.cast(t, dict(a=1)))
+        self.assertEqual(dict(a="1"), type_casting.cast(t, dict(a="1")))
+        self.assertEqual(dict(b=1), type_casting.cast(t, dict(b=1)))
+        self.assertEqual(c(1), type_casting.cast(t, dict(x=1)))
+        self.assertEqual(dict(a=1), type_casting.cast(t, collections.OrderedDict(a=1)))
+        with self.assertRaises(type_casting.CastingError):
+            type_casting.cast(t, dict(a=1, x=1))
+        with self.assertRaises(type_casting.CastingError):
+            type_casting.cast(t, [dict(x=1)])
+        caster = type_casting.compile(list[complex | c], instrument=True)
+        self.assertEqual([c(1), 1j], caster([dict(x=1), 1j]))
+        stats = caster.stats()
+        self.assertEqual(
+            [1], [v.calls for k, v in stats.items() if k.endswith(" -> complex")]
+        )
+
+    def test_union_screening_large_key_sets(self):
+        member = type_casting._common._UnionMember
+        screen = type_casting._common._UnionScreen(
+            (
+                member("td", None, (frozenset("a"), frozenset("ab")), {}),
+                member("dict", None, None, {}),
+            ),
+            "kind",
+        )
+        self.assertEqual(("td", "dict"), screen(dict(a=1)))
+        self.assertEqual(("dict",), screen(dict.fromkeys("abc")))
+        self.assertEqual(1, len(screen._by_keys))
+
+    def test_union_screening_by_tag(self):
+        member = type_casting._common._UnionMember
+        key_sets = (frozenset(["kind"]), frozenset(["kind", "x"]))
+        screen = type_casting._common._UnionScreen(
+            (
+                member("a", None, key_sets, dict(kind={"a": {str}})),
+                member("b", None, key_sets, dict(kind={"b": {str}, 1: {int}})),
+                member("c", None, key_sets, {}),
+            ),
+            "kind",
+        )
+        self.assertEqual(("b", "c"), screen(dict(kind="b", x=1)))
+        self.assertEqual(("b", "c"), screen(dict(kind=1)))
+        self.assertEqual(0, len(screen._by_keys))
+        self.assertEqual(("c",), screen(dict(kind=True)))
+        self.assertEqual(("a", "b", "c"), screen(dict(kind=[])))
+        self.assertEqual((), screen(dict(x=1)))
+        self.assertEqual(("a", "c"), screen(dict(kind="a", y=1)))
+        tds = [
+            typing.TypedDict(f"td{i}", dict(kind=typing.Literal[f"v{i}"], value=int))
+            for i in range(30)
+        ]
+        with unittest.mock.patch.object(
+            type_casting._common._UnionScreen, "max_key_sets", 0
+        ):
+            caster = type_casting.compile(typing.Union[tuple(tds)])
+            for i in range(30):
+                x = dict(kind=f"v{i}", value=i)
+                self.assertEqual(x, caster(x))
+                with self.assertRaises(type_casting.CastingError):
+                    caster(dict(x, y=i))
+
+    def test_casting_error(self):
+        class Payload:
+            n_repr = 0
+
+            def __repr__(self):
+                Payload.n_repr += 1
+                return "Payload()"
+
+        @dataclasses.dataclass
+        class c:
+            x: dict[str, list[int]]
+
+        with self.assertRaises(type_casting.CastingError) as e:
+            type_casting.cast(c | None, dict(x=dict(a=[1, Payload()])))
+        self.assertEqual(0, Payload.n_repr)
+        self.assertEqual((), e.exception.path)
+        with self.assertRaises(type_casting.CastingError) as e:
+            type_casting.cast(c, dict(x=dict(a=[1, Payload()])))
+        self.assertEqual(("x", "a", 1), e.exception.path)
+        self.assertEqual(int, e.exception.cls)
+        self.assertEqual(0, Payload.n_repr)
+        message = str(e.exception)
+        self.assertTrue(message.startswith("Payload(): <class "))
+        self.assertTrue(
+            message.endswith("is not compatible with <class 'int'> at ['x']['a'][1]")
+        )
+        self.assertEqual(1, Payload.n_repr)
+        self.assertLessEqual(
+            len(str(type_casting.CastingError(value="x" * 10000, cls=str))), 200
+        )
+
+    def test_call_with_inspect_caches_signature(self):
+        caster = type_casting.compile(list[type_casting.Call[str]])
+        x = [
+            dict(fn=f"{__name__}._TypedRecord", kwargs=dict(x=i, y=["2"]))
+            for i in range(3)
+        ]
+        with unittest.mock.patch(
+            "inspect.signature", wraps=type_casting._common.inspect.signature
+        ) as signature:
+            self.assertEqual([_TypedRecord(x=i, y=("2",)) for i in range(3)], caster(x))
+            self.assertEqual(1, signature.call_count)
+            caster(x)
+            self.assertEqual(1, signature.call_count)
+
+    def test_cast_many(self):
+        @dataclasses.dataclass
+        class c:
+            x: int
+
+        xs = [dict(x=1), dict(x="2"), dict(x=3)]
+        ys = type_casting.cast_many(c, iter(xs))
+        self.assertEqual(c(1), next(ys))
+        with self.assertRaises(type_casting.CastingError) as e:
+            next(ys)
+        self.assertEqual((1, "x"), e.exception.path)
+        self.assertEqual(
+            [c(1), c(3)], list(type_casting.cast_many(c, xs, errors="skip"))
+        )
+        ys = type_casting.cast_many_list(c, xs, errors="return")
+        self.assertEqual([c(1), c(3)], [ys[0], ys[2]])
+        self.assertIsInstance(ys[1], type_casting.CastingError)
+        self.assertEqual((1, "x"), ys[1].path)
+        with self.assertRaises(type_casting.CastingError) as e:
+            type_casting.cast_many_list(c, xs)
+        self.assertEqual((1, "x"), e.exception.path)
+        self.assertEqual(
+            [c(1), c(3)], type_casting.compile(c).many_list(xs, errors="skip")
+        )
+        with self.assertRaises(ValueError):
+            type_casting.cast_many(c, xs, errors="ignore")
+
+    def test_scalar_containers(self):
+        class MyInt(int):
+            pass
+
+        self.assertEqual([1, 2.0, True], type_casting.cast(list[float], (1, 2.0, True)))
+        self.assertEqual(
+            (1, MyInt(2)), type_casting.cast(tuple[int, ...], [1, MyInt(2)])
+        )
+        self.assertEqual({"a", "b"}, type_casting.cast(set[str], iter(["a", "b", "a"])))
+        self.assertEqual(
+            collections.deque([1, "a"]),
+            type_casting.cast(collections.deque[typing.Any], [1, "a"]),
+        )
+        self.assertEqual((), type_casting.cast(tuple[str, ...], []))
+        with self.assertRaises(type_casting.CastingError) as e:
+            type_casting.cast(list[int], [1, 2, 3.0])
+        self.assertEqual((2,), e.exception.path)
+        with self.assertRaises(type_casting.CastingError) as e:
+            type_casting.cast(tuple[float, ...], [1, "2"])
+        self.assertEqual((1,), e.exception.path)
+
+    def test_array(self):
+        t = typing.Annotated[array.array, "d"]
+        y = type_casting.cast(t, [1, 2.5])
+        self.assertEqual(array.array("d", [1.0, 2.5]), y)
+        self.assertIs(y, type_casting.cast(t, y))
+        self.assertEqual(
+            array.array("q", [1, 2]),
+            type_casting.cast(typing.Annotated[array.array, "q"], (1, 2)),
+        )
+        self.assertEqual(3, type_casting.cast(typing.Annotated[int, "meta"], 3))
+        for x in [[1, "a"], "ab", b"12345678", None]:
+            with self.assertRaises(type_casting.CastingError):
+                type_casting.cast(t, x)
+        with self.assertRaises(type_casting.CastingError):
+            type_casting.cast(typing.Annotated[array.array, "q"], [1.5])
+        with self.assertRaises(ValueError):
+            type_casting.cast(typing.Annotated[array.array, "float"], [1])
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_ndarray(self):
+        import numpy.typing
+
+        t = typing.Annotated[numpy.ndarray, numpy.float64, (None, 2)]
+        y = type_casting.cast(t, [[1, 2], [3.5, 4]])
+        self.assertEqual(numpy.float64, y.dtype)
+        self.assertEqual([[1.0, 2.0], [3.5, 4.0]], y.tolist())
+        self.assertIs(y, type_casting.cast(t, y))
+        self.assertEqual(
+            numpy.float32,
+            type_casting.cast(numpy.typing.NDArray[numpy.float32], [1.0]).dtype,
+        )
+        self.assertEqual([1], type_casting.cast(numpy.ndarray, [1]).tolist())
+        for x in [[[1, 2, 3]], [["a", "b"]], [[1, 2], [3]], [1, 2]]:
+            with self.assertRaises(type_casting.CastingError):
+                type_casting.cast(t, x)
+        with self.assertRaises(type_casting.CastingError):
+            type_casting.cast(typing.Annotated[numpy.ndarray, numpy.int64], [1.5])
+
+        @dataclasses.dataclass
+        class c:
+            x: int
+            y: float
+            z: list[float]
+
+        for backend in ["partial", "codegen"]:
+            y = type_casting.compile(c, backend=backend)(
+                dict(x=numpy.int32(1), y=numpy.float32(2), z=[numpy.int8(3), 4.0])
+            )
+            self.assertEqual(c(1, 2.0, [3, 4.0]), y)
+            self.assertEqual([int, float, int], [type(y.x), type(y.y), type(y.z[0])])
+        self.assertEqual(1, type_casting.cast(typing.Optional[int], numpy.int64(1)))
+        with self.assertRaises(type_casting.CastingError):
+            type_casting.cast(int, numpy.float64(1))
+
+    def test_cast_json_stream(self):
+        class Trickle:
+            def __init__(self, s):
+                self.s = s
+
+            def read(self, n):
+                y, self.s = self.s[:3], self.s[3:]
+                return y
+
+        @dataclasses.dataclass
+        class c2:
+            x: typing.Literal["xx"]
+            y: float = 1.0
+
+        class td(typing.TypedDict, total=False):
+            p: list[c2]
+            q: dict[str, set[int]]
+
+        @dataclasses.dataclass
+        class c1:
+            a: list[c2 | td]
+            b: collections.abc.Mapping[str, collections.deque[c2]]
+            c: tuple[float, ...]
+            d: decimal.Decimal
+            e: typing.Any
+
+        x = dict(
+            a=[dict(x="xx", y=2.5), dict(p=[dict(x="xx")], q=dict(k=[1, 2]))],
+            b=dict(k=[dict(x="xx", y=-1e-3)], l=[]),
+            c=[1, 2.5],
+            d="1.25",
+            e={'あ"': [None, True, False, {}]},
+        )
+        expected = type_casting.cast(c1, x)
+        s = json.dumps(x, ensure_ascii=False, indent=1)
+        self.assertEqual(expected, type_casting.cast_json_stream(c1, io.StringIO(s)))
+        self.assertEqual(expected, type_casting.cast_json_stream(c1, Trickle(s)))
+        self.assertEqual(
+            expected,
+            type_casting.compile(c1).cast_json_stream(Trickle(s.encode())),
+        )
+        x["b"]["k"].append(dict(x="xx", y="2"))
+        with self.assertRaises(type_casting.CastingError) as e:
+            type_casting.cast_json_stream(c1, Trickle(json.dumps(x)))
+        self.assertEqual(("b", "k", 1, "y"), e.exception.path)
+        for invalid in ['{"a": [], "z": 1}', '{"a": []}', "[]"]:
+            with self.assertRaises(type_casting.CastingError):
+                type_casting.cast_json_stream(c1, io.StringIO(invalid))
+        for invalid in ["[1, 2", "[1, 2] 3", "[1,]", '{"x": "xx",}', ""]:
+            with self.assertRaises(json.JSONDecodeError):
+                type_casting.cast_json_stream(list[c2 | int], Trickle(invalid))
+
+    def test_lazy_iterator(self):
+        @dataclasses.dataclass
+        class c:
+            x: collections.abc.Iterator[int]
+            y: collections.abc.Iterable[typing.Any]
+
+        pulled = []
+
+        def source():
+            for i in [1, 2, "3"]:
+                pulled.append(i)
+                yield i
+
+        y = type_casting.cast(c, dict(x=source(), y=[1, "a"]))
+        self.assertEqual([], pulled)
+        self.assertEqual(1, next(y.x))
+        self.assertEqual([1], pulled)
+        self.assertEqual(2, next(y.x))
+        with self.assertRaises(type_casting.CastingError) as e:
+            next(y.x)
+        self.assertEqual((2,), e.exception.path)
+        self.assertEqual([1, "a"], list(y.y))
+        with self.assertRaises(type_casting.CastingError):
+            type_casting.cast(c, dict(x=1, y=[]))
+
+    def test_iterator_in_union(self):
+        t = typing.Union[collections.abc.Iterable[int], str]
+        self.assertEqual("abc", type_casting.cast(t, "abc"))
+        y = type_casting.cast(t, (i for i in range(3)))
+        self.assertEqual([0, 1, 2], list(y))
+        t = collections.abc.Iterator[int] | None
+        self.assertEqual([1, 2], list(type_casting.cast(t, [1, 2])))
+        with self.assertRaises(type_casting.CastingError):
+            type_casting.cast(t, [1, "2"])
+
+    def test_check(self):
+        constructed = []
+
+        @dataclasses.dataclass
+        class c1:
+            x: int
+            y: list[float]
+            z: dict[str, tuple[int, str]]
+
+            def __post_init__(self):
+                constructed.append(self)
+
+        @dataclasses.dataclass
+        class c2:
+            c: c1
+            d: collections.abc.Iterator[int] = iter(())
+
+            def __post_init__(self):
+                constructed.append(self)
+
+        good = dict(c=dict(x=1, y=[1, 2.5], z=dict(a=(1, "b"))), d=[1, 2])
+        bad = dict(c=dict(x=1, y=[1, "2"], z={}))
+        self.assertTrue(type_casting.check(c2, good))
+        self.assertFalse(type_casting.check(c2, bad))
+        self.assertFalse(type_casting.check(c2, dict(c=good["c"], d=[1, "2"])))
+        self.assertFalse(type_casting.check(c2, dict(c=good["c"], d=1)))
+        self.assertFalse(type_casting.check(c2, dict(c=good["c"], e=1)))
+        self.assertFalse(type_casting.check(dict[str, tuple[int]], dict(a=(1, 2))))
+        self.assertTrue(type_casting.check(decimal.Decimal, "1.5"))
+        self.assertFalse(type_casting.check(decimal.Decimal, "abc"))
+        self.assertFalse(type_casting.check(list[decimal.Decimal], [1, "x"]))
+        it = iter([1, 2])
+        self.assertTrue(type_casting.check(collections.abc.Iterator[int], it))
+        self.assertEqual([1, 2], list(it))
+        for backend in ("partial", "codegen"):
+            caster = type_casting.compile(c2, backend=backend)
+            self.assertTrue(caster.check(good))
+            self.assertFalse(caster.check(bad))
+            with self.assertRaises(type_casting.CastingError) as e:
+                caster.validate(bad)
+            self.assertEqual(("c", "y", 1), e.exception.path)
+        self.assertEqual([], constructed)
+        self.assertEqual(good["c"]["x"], type_casting.cast(c2, good).c.x)
+        self.assertEqual(2, len(constructed))
+        record = f"{__name__}._TypedRecord"
+        self.assertTrue(
+            type_casting.check(
+                type_casting.Call[str], dict(fn=record, kwargs=dict(x=1, y=["2"]))
+            )
+        )
+        self.assertFalse(
+            type_casting.check(
+                type_casting.Call[str], dict(fn=record, kwargs=dict(x=1, y=[2]))
+            )
+        )
+        call = type_casting.Call[str, tuple[str, int], dict[str, int]]
+        self.assertTrue(
+            type_casting.check(call, dict(fn=f"{__name__}.Recording", args=["a", 1]))
+        )
+        self.assertFalse(
+            type_casting.check(call, dict(fn=f"{__name__}.Recording", args=[1, 1]))
+        )
+
+    def test_uncast(self):
+        @dataclasses.dataclass
+        class c1:
+            kind: typing.Literal["c1"]
+            d: decimal.Decimal
+            s: set[int]
+
+        @dataclasses.dataclass
+        class c2:
+            kind: typing.Literal["c2"]
+            t: tuple[int, decimal.Decimal]
+
+        class td(typing.TypedDict, total=False):
+            q: collections.deque[decimal.Decimal]
+
+        @dataclasses.dataclass
+        class c3:
+            u: list[c1 | c2 | None]
+            m: dict[str, td]
+            v: tuple[float, ...]
+            a: typing.Any = None
+
+        x = dict(
+            u=[
+                dict(kind="c1", d="1.5", s=[2]),
+                None,
+                dict(kind="c2", t=[1, "2"]),
+            ],
+            m=dict(a=dict(q=["3"]), b={}),
+            v=[1, 2.5],
+            a=dict(k=[1]),
+        )
+        y = type_casting.cast(c3, x)
+        self.assertEqual(x, type_casting.uncast(c3, y))
+        self.assertEqual(
+            dict(kind="c1", d=1.5, s=[2]),
+            type_casting.uncast(c1, y.u[0], {decimal.Decimal: float}),
+        )
+        self.assertEqual(["x"], type_casting.uncast(str | list[str], ["x"]))
+        self.assertEqual("x", type_casting.uncast(list[str] | str, "x"))
+        with self.assertRaises(type_casting.CastingError):
+            type_casting.uncast(c1 | c2, 1)
+        with self.assertRaises(ValueError):
+            type_casting.uncast(type_casting.GetAttr[int], 1)
+
+    def test_uncast_union_sharing_runtime_types(self):
+        class td1(typing.TypedDict):
+            a: decimal.Decimal
+
+        class td2(typing.TypedDict, total=False):
+            b: decimal.Decimal
+            c: "td2"
+
+        t = list[td1 | td2]
+        x = [dict(a="1.5"), dict(b="2"), dict(c=dict(b="3"))]
+        self.assertEqual(x, type_casting.uncast(t, type_casting.cast(t, x)))
+        t = list[int] | list[decimal.Decimal]
+        for x in ([1], ["1.5"], []):
+            self.assertEqual(x, type_casting.uncast(t, type_casting.cast(t, x)))
+        with self.assertRaises(type_casting.CastingError):
+            type_casting.uncast(td1 | td2, dict(d=1))
+
+    def test_encode_json(self):
+        @dataclasses.dataclass
+        class c1:
+            kind: typing.Literal["c1"]
+            d: decimal.Decimal
+            f: float
+            s: set[int]
+
+        class td(typing.TypedDict, total=False):
+            q: collections.deque[decimal.Decimal]
+            r: dict[int, bool | None]
+
+        @dataclasses.dataclass
+        class c2:
+            u: list[c1 | str | None]
+            m: dict[str, td]
+            v: tuple[int, float, str]
+            a: typing.Any = None
+
+        y = type_casting.cast(
+            c2,
+            dict(
+                u=[dict(kind="c1", d="1.5", f=float("nan"), s=[2]), None, "あ\n"],
+                m=dict(a=dict(q=["3"], r={1: True, 2: None}), b={}),
+                v=[1, 2.5, '"'],
+                a=dict(k=[1.0]),
+            ),
+        )
+        for hooks in (None, {decimal.Decimal: float}):
+            self.assertEqual(
+                json.dumps(
+                    type_casting.uncast(c2, y, hooks), separators=(",", ":")
+                ).encode(),
+                type_casting.encode_json(c2, y, hooks),
+            )
+        fp = io.BytesIO()
+        type_casting.dump_json(c2, y, fp)
+        self.assertEqual(type_casting.encode_json(c2, y), fp.getvalue())
+        with self.assertRaises(type_casting.CastingError):
+            type_casting.encode_json(list[c1 | None], [1])
+
+    def test_encode_json_union_sharing_runtime_types(self):
+        class td1(typing.TypedDict):
+            a: decimal.Decimal
+
+        class td2(typing.TypedDict, total=False):
+            b: decimal.Decimal
+
+        for t, x in (
+            (list[td1 | td2], [dict(a="1.5"), dict(b="2"), {}]),
+            (list[list[int] | list[decimal.Decimal]], [[1], ["1.5"], []]),
+        ):
+            y = type_casting.cast(t, x)
+            self.assertEqual(
+                json.dumps(type_casting.uncast(t, y), separators=(",", ":")).encode(),
+                type_casting.encode_json(t, y),
+            )
+
+    def test_pickle_caster(self):
+        caster = type_casting.compile(
+            list[_Point], {decimal.Decimal: float}, backend="codegen"
+        )
+        restored = pickle.loads(pickle.dumps(caster))
+        self.assertIsNot(caster, restored)
+        self.assertEqual("codegen", restored.backend)
+        self.assertEqual([_Point(1, 2.5)], restored([dict(x=1, y="2.5")]))
+        self.assertIs(restored, pickle.loads(pickle.dumps(caster)))
+        type_casting.cast_cache_clear()
+        pickle.loads(pickle.dumps(caster))
+        self.assertEqual(0, type_casting.cast_cache_info().currsize)
+        data = pickle.dumps(type_casting.compile(list[_Point] | None))
+        with unittest.mock.patch.object(
+            type_casting.latest, "Caster", wraps=type_casting.latest.Caster
+        ) as make:
+            for _ in range(3):
+                self.assertIsNone(pickle.loads(data)(None))
+            self.assertEqual(1, make.call_count)
+        caster = type_casting.compile(list[_Point], instrument=True)
+        restored = pickle.loads(pickle.dumps(caster))
+        self.assertIsNot(restored, pickle.loads(pickle.dumps(caster)))
+        restored([dict(x=1, y="2.5")])
+        self.assertEqual(1, restored.stats()["_Point"].calls)
+        self.assertEqual(0, pickle.loads(pickle.dumps(caster)).stats()["_Point"].calls)
+
+    def test_cast_many_executor(self):
+        xs = [dict(x=i, y=str(i)) for i in range(10)]
+        xs[7] = dict(x="7", y="7")
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            self.assertEqual(
+                [_Point(i, decimal.Decimal(i)) for i in range(10) if i != 7],
+                type_casting.cast_many_list(
+                    _Point, xs, errors="skip", executor=executor, chunksize=3
+                ),
+            )
+            with self.assertRaises(type_casting.CastingError) as e:
+                type_casting.cast_many_list(_Point, xs, executor=executor, chunksize=3)
+            self.assertEqual((7, "x"), e.exception.path)
+            ys = list(
+                type_casting.compile(_Point).many(
+                    xs, errors="return", executor=executor, chunksize=4
+                )
+            )
+            self.assertEqual((7, "x"), ys[7].path)
+            self.assertEqual(_Point(8, decimal.Decimal(8)), ys[8])
+            with self.assertRaises(ValueError):
+                type_casting.cast_many_list(_Point, xs, executor=executor, chunksize=0)
+
+    def test_parallel(self):
+        xs = [dict(x=i, y=str(i)) for i in range(10)]
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            for cls, make in (
+                (list[_Point], list),
+                (tuple[_Point, ...], tuple),
+                (collections.deque[_Point], collections.deque),
+            ):
+                caster = type_casting.compile(cls)
+                self.assertEqual(caster(xs), caster.parallel(xs, executor, threshold=3))
+                self.assertIsInstance(caster.parallel(xs, executor, threshold=3), make)
+            self.assertEqual(
+                set(range(10)),
+                type_casting.compile(set[int]).parallel(
+                    list(range(10)), executor, threshold=4
+                ),
+            )
+            caster = type_casting.compile(dict[str, _Point])
+            x = {str(i): v for i, v in enumerate(xs)}
+            self.assertEqual(caster(x), caster.parallel(x, executor, threshold=3))
+            x["8"] = dict(x=1)
+            with self.assertRaises(type_casting.CastingError) as e:
+                caster.parallel(x, executor, threshold=3)
+            self.assertEqual(("8",), e.exception.path)
+            ys = list(xs)
+            ys[7] = dict(x="7", y="7")
+            caster = type_casting.compile(list[_Point], backend="codegen")
+            with self.assertRaises(type_casting.CastingError) as e:
+                caster.parallel(ys, executor, threshold=4, chunksize=3)
+            self.assertEqual((7, "x"), e.exception.path)
+            with unittest.mock.patch.object(executor, "map") as map:
+                caster.parallel(xs[:3], executor, threshold=4)
+                type_casting.compile(_Point).parallel(xs[0], executor, threshold=1)
+                map.assert_not_called()
+
+    def test_instrument(self):
+        @dataclasses.dataclass
+        class a:
+            kind: typing.Literal["a"]
+            x: decimal.Decimal
+
+        @dataclasses.dataclass
+        class b:
+            y: int
+
+        caster = type_casting.compile(
+            list[a | b], {decimal.Decimal: decimal.Decimal}, instrument=True
+        )
+        self.assertEqual({}, {k: v for k, v in caster.stats().items() if v.calls})
+        caster([dict(kind="a", x="1"), dict(y=2), dict(kind="a", x="2")])
+        with self.assertRaises(type_casting.CastingError):
+            caster([dict(y="3")])
+        stats = caster.stats()
+        self.assertEqual((2, 0), stats[a.__qualname__][::2])
+        self.assertEqual((2, 1), stats[b.__qualname__][::2])
+        self.assertEqual(2, stats["implicit_conversions[Decimal]"].calls)
+        self.assertEqual((2, 1), stats[f"{a | b} -> {b.__qualname__}"][::2])
+        self.assertLessEqual(
+            stats["implicit_conversions[Decimal]"].time, stats[a.__qualname__].time
+        )
+        with self.assertRaises(ValueError):
+            type_casting.compile(a).stats()
+        self.assertIsInstance(
+            type_casting.compile(a, backend="codegen")._cast, types.FunctionType
+        )
+
+    def test_recursive(self):
+        @dataclasses.dataclass
+        class Node:
+            value: int
+            children: "list[Node]"
+            parent: "typing.Optional[Node]" = None
+
+        class Tree(typing.TypedDict):
+            name: str
+            children: "list[Tree]"
+
+        x = dict(
+            value=1, children=[dict(value=2, children=[]), dict(value=3, children=[])]
+        )
+        y = Node(1, [Node(2, []), Node(3, [])])
+        with unittest.mock.patch.object(
+            type_casting.latest,
+            "_analyze_kwargs",
+            wraps=type_casting.latest._analyze_kwargs,
+        ) as analyze_kwargs:
+            for backend in ("partial", "codegen"):
+                self.assertEqual(y, type_casting.compile(Node, backend=backend)(x))
+                self.assertEqual(1, analyze_kwargs.call_count)
+                analyze_kwargs.reset_mock()
+        with self.assertRaises(type_casting.CastingError) as e:
+            type_casting.cast(
+                Node, dict(value=1, children=[dict(value=2, children=[1])])
+            )
+        self.assertEqual(("children", 0, "children", 0), e.exception.path)
+        self.assertTrue(type_casting.check(Node, x))
+        self.assertEqual(dataclasses.asdict(y), type_casting.uncast(Node, y))
+        self.assertEqual(
+            json.dumps(dataclasses.asdict(y), separators=(",", ":")).encode(),
+            type_casting.encode_json(Node, y),
+        )
+        self.assertEqual(
+            y, type_casting.cast_json_stream(Node, io.StringIO(json.dumps(x)))
+        )
+        tree = dict(name="a", children=[dict(name="b", children=[])])
+        self.assertEqual(tree, type_casting.cast(Tree, tree))
+
+    @unittest.skipIf(sys.version_info < (3, 11), "Required requires Python 3.11")
+    def test_typeddict_required(self):
+        class td1(typing.TypedDict, total=False):
+            a: typing.Required[int]
+            b: typing.Annotated[str, "b"]
+
+        class td2(typing.TypedDict):
+            x: td1
+            y: typing.NotRequired[list[td1]]
+
+        with unittest.mock.patch.object(
+            type_casting.latest,
+            "_type_hints",
+            wraps=type_casting.latest._type_hints,
+        ) as type_hints:
+            self.assertEqual(
+                dict(x=dict(a=1), y=[dict(a=2, b="b")]),
+                type_casting.cast(td2, dict(x=dict(a=1), y=[dict(a=2, b="b")])),
+            )
+            self.assertEqual(
+                dict(x=dict(a=1)), type_casting.compile(td2)(dict(x=dict(a=1)))
+            )
+            self.assertEqual(2, type_hints.call_count)
+        with self.assertRaises(type_casting.CastingError) as e:
+            type_casting.cast(td2, dict(x=dict(b="b")))
+        self.assertEqual(("x",), e.exception.path)
+        with self.assertRaises(type_casting.CastingError):
+            type_casting.cast(td2, dict(y=[]))
+        namespace = dict(__name__=__name__, typing=typing)
+        exec(
+            builtins.compile(
+                "class td3(typing.TypedDict):\n"
+                "    a: int\n"
+                "    b: typing.NotRequired[int]\n"
+                "class td4(td3, total=False):\n"
+                "    c: typing.Required[int]\n",
+                "<string>",
+                "exec",
+                __future__.annotations.compiler_flag,
+                dont_inherit=True,
+            ),
+            namespace,
+        )
+        td4 = namespace["td4"]
+        self.assertEqual(dict(a=1, c=2), type_casting.cast(td4, dict(a=1, c=2)))
+        for x in (dict(a=1), dict(b=1, c=2)):
+            with self.assertRaises(type_casting.CastingError):
+                type_casting.cast(td4, x)
+
+    def test_literal_index(self):
+        codes = typing.Literal[tuple(f"r{i}" for i in range(5000)) + (1, None)]
+        caster = type_casting.compile(list[codes])
+        self.assertEqual(["r4999", 1, None], caster(["r4999", 1, None]))
+        for x in ("r5000", True, 1.0):
+            with self.assertRaises(type_casting.CastingError):
+                caster([x])
+        self.assertEqual(True, type_casting.cast(typing.Literal[1, True], True))
+        index = type_casting._common._literal_index((1, "a", [1]))
+        self.assertEqual(({1: {int}, "a": {str}}, ([1],)), index)
+        is_literal = functools.partial(type_casting._common._is_literal, *index)
+        self.assertEqual(
+            [True, False, True, True, False],
+            list(map(is_literal, (1, True, "a", [1], {}))),
+        )
+
+        @dataclasses.dataclass
+        class a:
+            kind: typing.Literal[1]
+
+        @dataclasses.dataclass
+        class b:
+            kind: typing.Literal[True]
+
+        caster = type_casting.compile(list[b | a])
+        self.assertEqual([a(1), b(True)], caster([dict(kind=1), dict(kind=True)]))
+
+    def test_enum(self):
+        class Color(enum.Enum):
+            RED = "red"
+            GREEN = "green"
+            CRIMSON = "red"
+
+        class Level(enum.IntEnum):
+            LOW = 1
+            HIGH = 2
+
+        class Perm(enum.Flag):
+            R = 4
+            W = 2
+
+        @dataclasses.dataclass
+        class c:
+            color: Color
+            level: Level
+            perm: Perm
+
+        self.assertEqual(
+            c(Color.RED, Level.HIGH, Perm.R | Perm.W),
+            type_casting.cast(c, dict(color="red", level=2, perm=6)),
+        )
+        self.assertIs(Color.GREEN, type_casting.cast(Color, Color.GREEN))
+        with self.assertRaises(type_casting.CastingError):
+            type_casting.cast(Color, "RED")
+        self.assertIs(Color.RED, type_casting.compile(Color, enum_names=True)("RED"))
+        for x in ("blue", 3):
+            with self.assertRaises(type_casting.CastingError):
+                type_casting.cast(Color | Level, x)
+        self.assertIs(Level.LOW, type_casting.cast(Color | Level, 1))
+        for t in (Level, Color | Level, typing.Optional[Level]):
+            self.assertIs(Level.HIGH, type_casting.cast(t, 2.0))
+            self.assertIs(Level.HIGH, type_casting.cast(t, decimal.Decimal(2)))
+        with self.assertRaises(type_casting.CastingError):
+            type_casting.cast(Perm, 1)
+        y = c(Color.GREEN, Level.LOW, Perm.W)
+        self.assertEqual(
+            dict(color="green", level=1, perm=2), type_casting.uncast(c, y)
+        )
+        self.assertEqual(
+            b'{"color":"green","level":1,"perm":2}', type_casting.encode_json(c, y)
+        )
+
+    def test_namedtuple(self):
+        class Point(typing.NamedTuple):
+            x: int
+            y: decimal.Decimal
+            label: str = ""
+
+        class Line(typing.NamedTuple):
+            start: Point
+            end: typing.Optional[Point]
+            next: "typing.Optional[Line]" = None
+
+        p = Point(1, decimal.Decimal("2.5"))
+        self.assertEqual(p, type_casting.cast(Point, [1, "2.5"]))
+        self.assertEqual(p, type_casting.cast(Point, dict(x=1, y="2.5")))
+        self.assertEqual(
+            Point(1, decimal.Decimal(2), "a"), type_casting.cast(Point, (1, 2, "a"))
+        )
+        self.assertIs(p, type_casting.cast(Point, p))
+        line = Line(p, None, Line(p, p))
+        self.assertEqual(
+            line,
+            type_casting.cast(
+                Line, dict(start=[1, "2.5"], end=None, next=[p, [1, "2.5"]])
+            ),
+        )
+        for x, path in (
+            ([1], ()),
+            ([1, 2, "", 3], ()),
+            (dict(y=1), ()),
+            (dict(x=1, y=2, z=3), ()),
+            ("ab", ()),
+            (["1", 2], (0,)),
+            (dict(x=1, y=[]), ("y",)),
+        ):
+            with self.assertRaises(type_casting.CastingError) as e:
+                type_casting.cast(Point, x)
+            self.assertEqual(path, e.exception.path)
+        self.assertEqual(
+            [[1, "2.5", ""], None, [[1, "2.5", ""], [1, "2.5", ""], None]],
+            type_casting.uncast(Line, line),
+        )
+        self.assertEqual(
+            b'[[1,"2.5",""],null,[[1,"2.5",""],[1,"2.5",""],null]]',
+            type_casting.encode_json(Line, line),
+        )
+
+    def test_construct_direct(self):
+        @dataclasses.dataclass
+        class A:
+            x: int
+            ys: list[int] = dataclasses.field(default_factory=list)
+            z: str = "z"
+
+        @dataclasses.dataclass(frozen=True)
+        class B:
+            a: A
+            b: typing.Optional["B"] = None
+
+        @dataclasses.dataclass(slots=True)
+        class C:
+            x: decimal.Decimal
+            y: int = 0
+
+        @dataclasses.dataclass(frozen=True, slots=True)
+        class D:
+            cs: tuple[C, ...]
+
+        @dataclasses.dataclass
+        class E:
+            x: int
+
+            def __post_init__(self):
+                self.x *= 3
+
+        @dataclasses.dataclass
+        class F:
+            x: int
+
+            def __init__(self, x):
+                self.x = x * 10
+
+        for backend in ("partial", "codegen"):
+            with self.subTest(backend=backend):
+                caster = type_casting.compile(
+                    tuple[A, B, D, E, F], backend=backend, construct="direct"
+                )
+                ret = caster(
+                    [
+                        dict(x=1),
+                        dict(a=dict(x=2, ys=[3], z="a"), b=dict(a=dict(x=4))),
+                        dict(cs=[dict(x="1.5"), dict(x=2, y=3)]),
+                        dict(x=2),
+                        dict(x=1),
+                    ]
+                )
+                self.assertEqual(
+                    (
+                        A(1),
+                        B(A(2, [3], "a"), B(A(4))),
+                        D((C(decimal.Decimal("1.5")), C(decimal.Decimal(2), 3))),
+                        E(2),
+                        F(1),
+                    ),
+                    ret,
+                )
+                self.assertEqual(6, ret[3].x)
+                self.assertEqual(10, ret[4].x)
+                a1, a2 = type_casting.compile(
+                    list[A], backend=backend, construct="direct"
+                )([dict(x=1)] * 2)
+                self.assertIsNot(a1.ys, a2.ys)
+                with self.assertRaises(dataclasses.FrozenInstanceError):
+                    ret[1].b = None
+                with self.assertRaises(type_casting.CastingError) as e:
+                    caster([dict(x=1), dict(a=dict(ys=[])), dict(cs=[]), {}, {}])
+                self.assertEqual((1, "a"), e.exception.path)
+        self.assertFalse(type_casting.compile(A, construct="direct").check(dict(z=2)))
+        with self.assertRaises(ValueError):
+            type_casting.compile(A, construct="new")
+
+        class Doubled:
+            def __set_name__(self, owner, name):
+                self.name = "_" + name
+
+            def __get__(self, obj, owner):
+                return 0 if obj is None else getattr(obj, self.name)
+
+            def __set__(self, obj, value):
+                setattr(obj, self.name, 2 * value)
+
+        @dataclasses.dataclass
+        class G:
+            x: int = Doubled()
+
+        for backend in ("partial", "codegen"):
+            caster = type_casting.compile(list[G], backend=backend, construct="direct")
+            self.assertEqual([G(1), G()], caster([dict(x=1), {}]))
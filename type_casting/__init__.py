@@ -11,11 +11,24 @@ elif sys.version_info.major == 3 and sys.version_info.minor == 9:
     from .py39 import Call, CastingError, EmptyDict, EmptyTuple, GetAttr, cast, override
 else:
     from .latest import (
+        CacheInfo,
         Call,
+        Caster,
         CastingError,
         EmptyDict,
         EmptyTuple,
         GetAttr,
+        NodeStats,
         cast,
+        cast_cache_clear,
+        cast_cache_info,
+        cast_json_stream,
+        cast_many,
+        cast_many_list,
+        check,
+        compile,
+        dump_json,
+        encode_json,
         override,
+        uncast,
     )
@@ -1,9 +1,26 @@
+import array
 import ast
+import builtins
+import codecs
 import collections
 import decimal
+import functools
+import importlib
 import inspect
+import itertools
+import json
+import json.decoder
+import json.encoder
+import json.scanner
+import keyword
+import linecache
+import math
+import re
+import reprlib
 import sys
-from typing import Any, Generic, TypedDict, TypeVar
+import threading
+import time
+from typing import Any, Generic, NamedTuple, TypedDict, TypeVar
 
 _TPath = TypeVar("_TPath", bound=str)
 _TArgs = TypeVar("_TArgs")
@@ -14,10 +31,49 @@ class Error(Exception):
     pass
 
 
-class CastingError(Error):
+class _Missing:
     pass
 
 
+class CastingError(Error):
+    """Raised when a value is not compatible with the target type.
+
+    The message is rendered from `value`, `cls` and `path` only when the error is formatted,
+    and the repr of `value` is truncated, so failed union branches stay cheap for large inputs.
+    """
+
+    def __init__(self, *args, value=_Missing, cls=None, path=()):
+        super().__init__(*args)
+        self.value = value
+        self.cls = cls
+        self._reversed_path = list(reversed(path))
+
+    @property
+    def path(self):
+        """The keys and indices from the outermost input down to `value`."""
+        return tuple(reversed(self._reversed_path))
+
+    def _prepend_path(self, key):
+        self._reversed_path.append(key)
+        return self
+
+    def __str__(self):
+        if self.value is _Missing:
+            message = super().__str__()
+        else:
+            message = f"{_repr.repr(self.value)}: {type(self.value)} is not compatible with {self.cls}"
+            if self.args:
+                message = f"{super().__str__()}: {message}"
+        if self._reversed_path:
+            message += " at " + "".join(f"[{k!r}]" for k in self.path)
+        return message
+
+
+_repr = reprlib.Repr()
+_repr.maxstring = 80
+_repr.maxother = 80
+
+
 class EmptyDict(TypedDict):
     pass
 
@@ -53,6 +109,196 @@ class _CallWithArgsAndKwargs(Generic[_TPath, _TArgs, _TKwargs]):
 Call = _CallOf()
 
 
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int
+    currsize: int
+
+
+class NodeStats(NamedTuple):
+    calls: int
+    time: float
+    failures: int
+
+
+class _PlanCache:
+    """A thread-safe cache of analyzed plans with hit/miss/eviction counters.
+
+    Hits are lock-free and only mark their entry as referenced;
+    eviction skips and clears the referenced entries (CLOCK), approximating LRU.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key, make, refine=None):
+        """Return the plan of `key`, calling `make()` on a miss.
+
+        `refine()`, if given, returns a finer key telling apart the plans that `key` does
+        not (e.g., the orders of the members of unions) and is only called on a miss.
+        """
+        try:
+            entry = self._entries[key]
+        except KeyError:
+            entry = None
+            if refine is not None:
+                key = refine()
+                entry = self._entries.get(key)
+        except TypeError:
+            # Unhashable types or conversions are analyzed without caching.
+            return make()
+        if entry is not None:
+            entry[1] = True
+            self._hits += 1
+            return entry[0]
+        plan = make()
+        with self._lock:
+            self._misses += 1
+            self._entries[key] = [plan, False]
+            while len(self._entries) > self.maxsize:
+                oldest = next(iter(self._entries))
+                entry = self._entries.pop(oldest)
+                if entry[1]:
+                    entry[1] = False
+                    self._entries[oldest] = entry
+                else:
+                    self._evictions += 1
+        return plan
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(
+                self._hits,
+                self._misses,
+                self._evictions,
+                self.maxsize,
+                len(self._entries),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+
+class _UnionMember(NamedTuple):
+    caster: Any
+    accepts: Any
+    key_sets: Any
+    tags: Any
+
+
+class _UnionScreen:
+    """Select the members of a union that are able to accept `x`, keeping their order.
+
+    `accepts(t)` tells whether a member can accept an input of type `t` (`None` means any type).
+    Dict inputs are first looked up by the value of `tag_key` among the Literal `tags` of the members.
+    If the value is not a known tag, they are screened by `key_sets=(required, allowed)` and `tags`.
+    The screens are cached by the input type and by the key set and the tag, respectively.
+    Key sets larger than any allowed one are not cached, since they only fit the members without `key_sets`.
+    The caches are shared by threads without locks; concurrent misses compute the same entries.
+    """
+
+    max_key_sets = 1024
+
+    def __init__(self, members, tag_key):
+        self.members = members
+        self.tag_key = tag_key
+        self._max_keys = max(
+            (len(m.key_sets[1]) for m in members if m.key_sets is not None),
+            default=0,
+        )
+        self._tags = {}
+        for m in members:
+            for v, types in m.tags.get(tag_key, {}).items():
+                self._tags.setdefault(v, set()).update(types)
+        self._by_type = {}
+        self._by_keys = {}
+
+    def __call__(self, x):
+        t = type(x)
+        try:
+            casters, members, by_tag = self._by_type[t]
+        except KeyError:
+            casters, members, by_tag = self._by_type[t] = self._screen_type(t)
+        if members is None:
+            return casters
+        tag = x.get(self.tag_key, _Missing)
+        try:
+            return by_tag[tag][type(tag)]
+        except (KeyError, TypeError):
+            pass
+        if len(x) > self._max_keys:
+            return self._screen_dict(members, x.keys(), tag)
+        try:
+            key = (t, frozenset(x), type(tag), tag)
+            return self._by_keys[key]
+        except KeyError:
+            casters = self._screen_dict(members, x.keys(), tag)
+            if len(self._by_keys) < self.max_key_sets:
+                self._by_keys[key] = casters
+            return casters
+        except TypeError:
+            return self._screen_dict(members, x.keys(), tag)
+
+    def _screen_type(self, t):
+        members = tuple(m for m in self.members if _accepts(m.accepts, t))
+        casters = tuple(m.caster for m in members)
+        if (
+            issubclass(t, dict)
+            and len(members) > 1
+            and any(m.key_sets is not None for m in members)
+        ):
+            by_tag = {
+                v: {t: self._tagged(members, v, t) for t in types}
+                for v, types in self._tags.items()
+            }
+            return casters, members, by_tag
+        return casters, None, None
+
+    def _tagged(self, members, v, t):
+        return tuple(
+            m.caster
+            for m in members
+            if self.tag_key not in m.tags or t in m.tags[self.tag_key].get(v, ())
+        )
+
+    def _screen_dict(self, members, keys, tag):
+        return tuple(
+            m.caster
+            for m in members
+            if (m.key_sets is None or (keys >= m.key_sets[0] and keys <= m.key_sets[1]))
+            and _has_tag(m.tags, self.tag_key, tag)
+        )
+
+
+def _accepts(accepts, t):
+    return accepts is None or accepts(t)
+
+
+def _has_tag(tags, key, tag):
+    if key not in tags:
+        return True
+    try:
+        types = tags[key].get(tag)
+    except TypeError:
+        return True
+    return types is not None and type(tag) in types
+
+
+def _conversions_key(implicit_conversions):
+    return frozenset(implicit_conversions.items())
+
+
 def override(x, overrides: collections.abc.Iterable[str]):
     for ks, v in map(_parse_override, overrides):
         _insert(x, ks, v)
@@ -82,35 +328,196 @@ def _parse_override(s: str):
     return keys, value
 
 
+def _numpy_item(x, kinds):
+    """Return `x.item()` for a NumPy scalar of one of `kinds`, or `_Missing`."""
+    numpy = sys.modules.get("numpy")
+    if numpy is not None and isinstance(x, tuple(getattr(numpy, k) for k in kinds)):
+        return x.item()
+    return _Missing
+
+
+def _is_number_type(types, kinds, t):
+    if issubclass(t, types):
+        return True
+    numpy = sys.modules.get("numpy")
+    return numpy is not None and issubclass(t, tuple(getattr(numpy, k) for k in kinds))
+
+
 def _analyze_Decimal(x):
     if not isinstance(x, (str, int, float)):
-        raise CastingError(
-            f"{x}: {type(x)} is not compatible with <class 'decimal.Decimal'>"
-        )
+        raise CastingError(value=x, cls=decimal.Decimal)
     return decimal.Decimal(x)
 
 
+def _check_Decimal(x):
+    if not isinstance(x, (str, int, float)):
+        raise CastingError(value=x, cls=decimal.Decimal)
+    if isinstance(x, str):
+        try:
+            decimal.Decimal(x)
+        except decimal.InvalidOperation:
+            raise CastingError(value=x, cls=decimal.Decimal) from None
+    return x
+
+
+def _analyze_Enum(cls, members, names, fallback, x):
+    """Look up the member of the Enum `cls` by `x`, its value or, if `names` is given, its name.
+
+    `cls(x)` is only called if `fallback` is true, i.e., if `cls` defines `_missing_` (e.g., `Flag`) or has unhashable values.
+    """
+    if type(x) is cls:
+        return x
+    try:
+        return members[x]
+    except (KeyError, TypeError):
+        pass
+    if names is not None and type(x) is str and x in names:
+        return names[x]
+    if fallback:
+        try:
+            return cls(x)
+        except (ValueError, TypeError):
+            pass
+    raise CastingError(value=x, cls=cls)
+
+
+def _analyze_NamedTuple(cls, fields, defaults, x):
+    """Cast a dict of the fields or a list or a tuple of the values to the NamedTuple `cls`.
+
+    The values are cast by `fields`, missing fields are filled from `defaults`,
+    and the instance is constructed by `tuple.__new__`, bypassing `cls.__new__`.
+    """
+    if type(x) is cls:
+        return x
+    y = []
+    append = y.append
+    if isinstance(x, dict):
+        if not x.keys() <= fields.keys():
+            raise CastingError(value=x, cls=cls)
+        for k, f in fields.items():
+            if k in x:
+                try:
+                    append(f(x[k]))
+                except CastingError as e:
+                    raise e._prepend_path(k)
+            elif k in defaults:
+                append(defaults[k])
+            else:
+                raise CastingError(value=x, cls=cls)
+    elif isinstance(x, (list, tuple)):
+        if not len(fields) - len(defaults) <= len(x) <= len(fields):
+            raise CastingError(value=x, cls=cls)
+        try:
+            for f, v in zip(fields.values(), x):
+                append(f(v))
+        except CastingError as e:
+            raise e._prepend_path(len(y))
+        for k in itertools.islice(fields, len(y), None):
+            append(defaults[k])
+    else:
+        raise CastingError(value=x, cls=cls)
+    return tuple.__new__(cls, y)
+
+
 def _analyze_complex(x):
     if not isinstance(x, (int, float, complex)):
-        raise CastingError(f"{x}: {type(x)} is not compatible with <class 'complex'>")
+        y = _numpy_item(x, ("integer", "floating", "complexfloating"))
+        if y is _Missing:
+            raise CastingError(value=x, cls=complex)
+        return y
     return x
 
 
 def _analyze_float(x):
     if not isinstance(x, (int, float)):
-        raise CastingError(f"{x}: {type(x)} is not compatible with <class 'float'>")
+        y = _numpy_item(x, ("integer", "floating"))
+        if y is _Missing:
+            raise CastingError(value=x, cls=float)
+        return y
     return x
 
 
 def _analyze_type(cls, x):
     if not isinstance(x, cls):
-        raise CastingError(f"{x}: {type(x)} is not compatible with {cls}")
+        if cls is int:
+            y = _numpy_item(x, ("integer",))
+            if y is not _Missing:
+                return y
+        raise CastingError(value=x, cls=cls)
     return x
 
 
+def _analyze_ndarray(numpy, dtype, shape, cls, x):
+    if isinstance(x, numpy.ndarray):
+        y = x
+    else:
+        try:
+            y = numpy.asarray(x)
+        except (TypeError, ValueError):
+            raise CastingError(value=x, cls=cls) from None
+    if dtype is not None and y.dtype != dtype:
+        if not numpy.can_cast(y.dtype, dtype, casting="same_kind"):
+            raise CastingError(value=x, cls=cls)
+        y = y.astype(dtype)
+    if shape is not None and not (
+        len(shape) == y.ndim
+        and all(n is None or n == m for n, m in zip(shape, y.shape))
+    ):
+        raise CastingError(value=x, cls=cls)
+    return y
+
+
 def _analyze_GetAttr(path, x):
-    module_and_names = path(x).split(".")
-    return _deep_getattr(sys.modules[module_and_names[0]], module_and_names[1:])
+    return _resolve(path(x), False)
+
+
+def _analyze_GetAttr_with_import(path, x):
+    return _resolve(path(x), True)
+
+
+_resolved = {}
+_max_resolved = 4096
+
+
+def _resolve(path, import_modules):
+    """Resolve a dotted `path` to an object.
+
+    Only the split of `path` into a module and attribute names is cached;
+    the attributes are looked up on each call, so that patched or reloaded ones are seen.
+    With `import_modules`, the longest importable prefix of `path` is imported if needed.
+    """
+    key = (path, import_modules)
+    try:
+        module_name, names = _resolved[key]
+        module = sys.modules[module_name]
+    except KeyError:
+        names = path.split(".")
+        n = _import_prefix(names) if import_modules else 1
+        module_name, names = ".".join(names[:n]), names[n:]
+        module = sys.modules[module_name]
+        if len(_resolved) >= _max_resolved:
+            _resolved.pop(next(iter(_resolved), None), None)
+        _resolved[key] = (module_name, names)
+    return _deep_getattr(module, names)
+
+
+def _import_prefix(names):
+    """Import the longest importable prefix of `names` and return its length."""
+    for n in range(len(names), 0, -1):
+        module_name = ".".join(names[:n])
+        if module_name in sys.modules:
+            return n
+        if not all(names[:n]):
+            continue
+        try:
+            importlib.import_module(module_name)
+            return n
+        except ModuleNotFoundError as e:
+            if e.name is None or not (
+                module_name == e.name or module_name.startswith(e.name + ".")
+            ):
+                raise
+    return 1
 
 
 def _deep_getattr(x, names):
@@ -119,16 +526,81 @@ def _deep_getattr(x, names):
     return x
 
 
+def _check__CallWithArgsAndKwargs(cls, fn, args, kwargs, x):
+    if "fn" not in x:
+        raise CastingError('The "fn" key not found', value=x, cls=cls)
+    fn(x["fn"])
+    try:
+        args(x.get("args", []))
+    except CastingError as e:
+        raise e._prepend_path("args")
+    try:
+        kwargs(x.get("kwargs", {}))
+    except CastingError as e:
+        raise e._prepend_path("kwargs")
+    return x
+
+
 def _analyze__CallWithArgsAndKwargs(cls, fn, args, kwargs, x):
     if "fn" not in x:
-        raise CastingError(f'The "fn" key not found in `x` for {cls}: {x}')
-    return fn(x["fn"])(*args(x.get("args", [])), **kwargs(x.get("kwargs", {})))
+        raise CastingError('The "fn" key not found', value=x, cls=cls)
+    fn = fn(x["fn"])
+    try:
+        args = args(x.get("args", []))
+    except CastingError as e:
+        raise e._prepend_path("args")
+    try:
+        kwargs = kwargs(x.get("kwargs", {}))
+    except CastingError as e:
+        raise e._prepend_path("kwargs")
+    return fn(*args, **kwargs)
 
 
-def _analyze__CallWithInspect(cls, analyze, implicit_conversions, path, x):
+def _analyze__CallWithInspect(cls, analyze, implicit_conversions, signatures, path, x):
     if "fn" not in x:
-        raise CastingError(f'The "fn" key not found in `x` for {cls}: {x}')
+        raise CastingError('The "fn" key not found', value=x, cls=cls)
     fn = path(x["fn"])
+    fields, required_key_set = _cached_signature(
+        signatures, analyze, implicit_conversions, fn
+    )
+    try:
+        return _cast_kwargs(fn, fields, required_key_set, x.get("kwargs", {}))
+    except CastingError as e:
+        raise e._prepend_path("kwargs")
+
+
+def _check__CallWithInspect(cls, analyze, implicit_conversions, signatures, path, x):
+    if "fn" not in x:
+        raise CastingError('The "fn" key not found', value=x, cls=cls)
+    fn = path(x["fn"])
+    fields, required_key_set = _cached_signature(
+        signatures, analyze, implicit_conversions, fn
+    )
+    try:
+        _check_kwargs(fn, fields, required_key_set, x.get("kwargs", {}))
+    except CastingError as e:
+        raise e._prepend_path("kwargs")
+    return x
+
+
+_signatures_lock = threading.Lock()
+
+
+def _cached_signature(signatures, analyze, implicit_conversions, fn):
+    # `WeakKeyDictionary` is not thread-safe, unlike the plain dicts of the other caches.
+    try:
+        with _signatures_lock:
+            return signatures[fn]
+    except KeyError:
+        signature = _analyze_signature(analyze, implicit_conversions, fn)
+        with _signatures_lock:
+            signatures[fn] = signature
+        return signature
+    except TypeError:
+        return _analyze_signature(analyze, implicit_conversions, fn)
+
+
+def _analyze_signature(analyze, implicit_conversions, fn):
     fields = {}
     required_key_set = set()
     for p in inspect.signature(fn).parameters.values():
@@ -143,35 +615,192 @@ def _analyze__CallWithInspect(cls, analyze, implicit_conversions, path, x):
         fields[p.name] = analyze(p.annotation, implicit_conversions)
         if p.default == inspect.Signature.empty:
             required_key_set.add(p.name)
-    return _cast_kwargs(fn, fields, required_key_set, x.get("kwargs", {}))
+    return fields, required_key_set
 
 
-def _analyze_Literal(cls, candidates, x):
-    if x not in candidates:
-        raise CastingError(f"{x} is not compatible with {cls}")
-    return x
+def _literal_index(values):
+    """Map the hashable values of a Literal to their types; return the others."""
+    index = {}
+    unhashable = []
+    for v in values:
+        try:
+            index.setdefault(v, set()).add(type(v))
+        except TypeError:
+            unhashable.append(v)
+    return {v: frozenset(types) for v, types in index.items()}, tuple(unhashable)
+
+
+def _analyze_Literal(cls, index, unhashable, x):
+    """Accept `x` if it equals a value of the Literal of the same type (`True == 1`)."""
+    if _is_literal(index, unhashable, x):
+        return x
+    raise CastingError(value=x, cls=cls)
 
 
 def _analyze_set(vcls, x):
-    return set(vcls(v) for v in x)
+    y = set()
+    add = y.add
+    i = 0
+    try:
+        for v in x:
+            add(vcls(v))
+            i += 1
+    except CastingError as e:
+        raise e._prepend_path(i)
+    return y
 
 
 def _analyze_list(vcls, x):
-    return [vcls(v) for v in x]
+    y = []
+    append = y.append
+    try:
+        for v in x:
+            append(vcls(v))
+    except CastingError as e:
+        raise e._prepend_path(len(y))
+    return y
+
+
+def _check_iterable(vcls, x):
+    i = 0
+    try:
+        for v in x:
+            vcls(v)
+            i += 1
+    except CastingError as e:
+        raise e._prepend_path(i)
+    return x
+
+
+def _check_iterator(cls, vcls, x):
+    try:
+        it = iter(x)
+    except TypeError:
+        raise CastingError(value=x, cls=cls) from None
+    if it is x:
+        # Checking the elements would exhaust the caller's one-shot iterator.
+        return x
+    return _check_iterable(vcls, it)
+
+
+def _check_scalars(types, vcls, x):
+    if not isinstance(x, (list, tuple)):
+        x = list(x)
+    if types and not all(issubclass(t, types) for t in set(map(type, x))):
+        _check_iterable(vcls, x)
+    return x
+
+
+def _check_dict(kcls, vcls, x):
+    for k, v in x.items():
+        try:
+            kcls(k)
+            vcls(v)
+        except CastingError as e:
+            raise e._prepend_path(k)
+    return x
+
+
+def _check_tuple(cls, vclss, x):
+    if len(vclss) != len(x):
+        raise CastingError(value=x, cls=cls)
+    _check_iterable(_apply, zip(vclss, x))
+    return x
+
+
+def _apply(fx):
+    return fx[0](fx[1])
+
+
+def _analyze_iterator(cls, vcls, x):
+    try:
+        it = iter(x)
+    except TypeError:
+        raise CastingError(value=x, cls=cls) from None
+    if vcls is _identity1:
+        return it
+    return _iter_cast(vcls, it)
+
+
+def _analyze_eager_iterator(cls, vcls, x):
+    """`_analyze_iterator` casting every element up front, for unions."""
+    try:
+        it = iter(x)
+    except TypeError:
+        raise CastingError(value=x, cls=cls) from None
+    return iter(list(_iter_cast(vcls, it)))
+
+
+def _iter_cast(vcls, it):
+    for i, v in enumerate(it):
+        try:
+            y = vcls(v)
+        except CastingError as e:
+            raise e._prepend_path(i)
+        yield y
 
 
 def _analyze_dict(kcls, vcls, x):
-    return {kcls(k): vcls(v) for k, v in x.items()}
+    y = {}
+    for k, v in x.items():
+        try:
+            y[kcls(k)] = vcls(v)
+        except CastingError as e:
+            raise e._prepend_path(k)
+    return y
 
 
 def _analyze_deque(vcls, x):
-    return collections.deque(vcls(v) for v in x)
+    y = collections.deque()
+    append = y.append
+    try:
+        for v in x:
+            append(vcls(v))
+    except CastingError as e:
+        raise e._prepend_path(len(y))
+    return y
 
 
 def _analyze_tuple(cls, vclss, x):
     if len(vclss) != len(x):
-        raise CastingError(f"{x}: {type(x)} is not compatible with {cls}")
-    return tuple(vcls(v) for vcls, v in zip(vclss, x))
+        raise CastingError(value=x, cls=cls)
+    y = []
+    append = y.append
+    try:
+        for vcls, v in zip(vclss, x):
+            append(vcls(v))
+    except CastingError as e:
+        raise e._prepend_path(len(y))
+    return tuple(y)
+
+
+def _analyze_variadic_tuple(vcls, x):
+    return tuple(_analyze_list(vcls, x))
+
+
+def _analyze_scalars(make, types, vcls, x):
+    """Cast an iterable of scalars that `vcls` only checks with `isinstance(v, types)`.
+
+    The element types are checked in a single pass of C-level `map(type, ...)`,
+    and `vcls` is only called for each element if the check fails.
+    """
+    y = list(x)
+    if types and not all(issubclass(t, types) for t in set(map(type, y))):
+        y = _analyze_list(vcls, y)
+    return y if make is list else make(y)
+
+
+def _analyze_array(typecode, cls, x):
+    if isinstance(x, array.array) and x.typecode == typecode:
+        return x
+    if isinstance(x, (bytes, bytearray, memoryview)) or (
+        isinstance(x, str) and typecode != "u"
+    ):
+        raise CastingError(value=x, cls=cls)
+    try:
+        return array.array(typecode, x)
+    except (TypeError, OverflowError):
+        raise CastingError(value=x, cls=cls) from None
 
 
 def _analyze_Union(cls, uclss, x):
@@ -180,7 +809,338 @@ def _analyze_Union(cls, uclss, x):
             return ucls(x)
         except CastingError:
             pass
-    raise CastingError(f"{x}: {type(x)} is not compatible with {cls}")
+    raise CastingError(value=x, cls=cls)
+
+
+def _analyze_ScreenedUnion(cls, screen, x):
+    for ucls in screen(x):
+        try:
+            return ucls(x)
+        except CastingError:
+            pass
+    raise CastingError(value=x, cls=cls)
+
+
+def _uncast_object(fields, x):
+    return {k: getattr(x, k) if f is None else f(getattr(x, k)) for k, f in fields}
+
+
+def _uncast_typeddict(fields, x):
+    return {k: v if fields[k] is None else fields[k](v) for k, v in x.items()}
+
+
+def _uncast_Enum(x):
+    return x.value
+
+
+def _uncast_list(vcls, x):
+    return [vcls(v) for v in x]
+
+
+def _uncast_tuple(vclss, x):
+    return [vcls(v) for vcls, v in zip(vclss, x)]
+
+
+def _uncast_dict(kcls, vcls, x):
+    return {kcls(k): vcls(v) for k, v in x.items()}
+
+
+def _uncast_tolist(x):
+    return x.tolist()
+
+
+class _DispatchUnion:
+    """Call the function of the member of a union whose runtime types include `type(x)`.
+
+    Members listing the exact type of `x` take precedence over those listing its bases.
+    If several members match, the first whose `check(x)` holds is called.
+    The selection is cached by the type of `x`.
+    """
+
+    def __init__(self, cls, members):
+        self.cls = cls
+        self.members = members
+        self._by_type = {}
+
+    def __call__(self, x):
+        t = type(x)
+        f = self._by_type.get(t)
+        if f is None:
+            f = self._by_type[t] = self._select(t, x)
+        return f(x)
+
+    def _select(self, t, x):
+        exact = [m for m in self.members if t in m[0]]
+        candidates = exact + [
+            m for m in self.members if m not in exact and issubclass(t, m[0])
+        ]
+        if not candidates:
+            raise CastingError(value=x, cls=self.cls)
+        if len(candidates) == 1:
+            return candidates[0][1]
+        return functools.partial(
+            _dispatch_checked, self.cls, tuple((check, f) for _, f, check in candidates)
+        )
+
+
+def _dispatch_checked(cls, members, x):
+    for check, f in members:
+        if check(x):
+            return f(x)
+    raise CastingError(value=x, cls=cls)
+
+
+def _is_instance(types, x):
+    return isinstance(x, types)
+
+
+def _is_literal(index, unhashable, x):
+    try:
+        types = index.get(x)
+    except TypeError:
+        pass
+    else:
+        if types is not None and type(x) in types:
+            return True
+    return any(type(v) is type(x) and v == x for v in unhashable)
+
+
+def _is_any_of(checks, x):
+    return any(check(x) for check in checks)
+
+
+def _is_collection_of(types, vcheck, x):
+    # The elements of one-shot iterators are left unconsumed.
+    return isinstance(x, types) and (iter(x) is x or all(map(vcheck, x)))
+
+
+def _is_tuple_of(vchecks, x):
+    return (
+        isinstance(x, tuple)
+        and len(x) == len(vchecks)
+        and all(check(v) for check, v in zip(vchecks, x))
+    )
+
+
+def _is_dict_of(types, kcheck, vcheck, x):
+    return isinstance(x, types) and all(kcheck(k) and vcheck(v) for k, v in x.items())
+
+
+def _is_typeddict(required_key_set, fields, x):
+    return (
+        isinstance(x, dict)
+        and required_key_set.issubset(x)
+        and all(k in fields and fields[k](v) for k, v in x.items())
+    )
+
+
+_encode_str = json.encoder.encode_basestring_ascii
+_encode_plain = json.JSONEncoder(separators=(",", ":")).encode
+
+
+def _encode_int(x):
+    if type(x) is int:
+        return int.__repr__(x)
+    return _encode_plain(x)
+
+
+def _encode_float(x):
+    if type(x) is float and math.isfinite(x):
+        return float.__repr__(x)
+    return _encode_plain(x)
+
+
+def _encode_Decimal(x):
+    return _encode_str(str(x))
+
+
+def _encode_tolist(x):
+    return _encode_plain(x.tolist())
+
+
+def _encode_hooked(hook, x):
+    return _encode_plain(hook(x))
+
+
+def _encode_key(vcls, x):
+    y = vcls(x)
+    return y if y.startswith('"') else '"' + y + '"'
+
+
+def _encode_object(fields, x):
+    return "{" + ",".join([p + f(getattr(x, k)) for k, p, f in fields]) + "}"
+
+
+def _encode_typeddict(prefixes, fields, x):
+    return "{" + ",".join([prefixes[k] + fields[k](v) for k, v in x.items()]) + "}"
+
+
+def _encode_list(vcls, x):
+    return "[" + ",".join(map(vcls, x)) + "]"
+
+
+def _encode_tuple(vclss, x):
+    return "[" + ",".join([vcls(v) for vcls, v in zip(vclss, x)]) + "]"
+
+
+def _encode_dict(kcls, vcls, x):
+    return "{" + ",".join([kcls(k) + ":" + vcls(v) for k, v in x.items()]) + "}"
+
+
+_ERRORS = ("raise", "skip", "return")
+
+
+def _cast_many(cast, xs, errors):
+    if errors not in _ERRORS:
+        raise ValueError(f"Unsupported errors {errors}: {_ERRORS}")
+    return _iter_cast_many(cast, xs, errors)
+
+
+def _iter_cast_many(cast, xs, errors):
+    for i, x in enumerate(xs):
+        try:
+            y = cast(x)
+        except CastingError as e:
+            if errors == "raise":
+                raise e._prepend_path(i)
+            elif errors == "return":
+                yield e._prepend_path(i)
+            continue
+        yield y
+
+
+def _analyze_instrumented(stats, f, x):
+    """Call `f(x)`, adding to the `[calls, time, failures]` list `stats`.
+
+    The time includes that of the nested nodes, and failures count the `CastingError`s.
+    """
+    t = time.perf_counter()
+    try:
+        return f(x)
+    except CastingError:
+        stats[2] += 1
+        raise
+    finally:
+        stats[0] += 1
+        stats[1] += time.perf_counter() - t
+
+
+def _cast_many_parallel(cast, xs, errors, executor, chunksize):
+    """Cast `xs` in chunks of `chunksize` items on `executor`, yielding the results in order.
+
+    `cast` is pickled once for each chunk if `executor` runs it in other processes.
+    """
+    if errors not in _ERRORS:
+        raise ValueError(f"Unsupported errors {errors}: {_ERRORS}")
+    if chunksize < 1:
+        raise ValueError(f"chunksize < 1: {chunksize}")
+    results = executor.map(
+        functools.partial(_cast_chunk, cast), _chunks(iter(xs), chunksize)
+    )
+    return _iter_cast_chunks(results, errors)
+
+
+def _chunks(it, size):
+    while chunk := list(itertools.islice(it, size)):
+        yield chunk
+
+
+def _cast_chunk(cast, xs):
+    """Return the results of casting `xs` and the indices of the failures."""
+    ys = []
+    failed = []
+    for i, x in enumerate(xs):
+        try:
+            ys.append(cast(x))
+        except CastingError as e:
+            ys.append(e)
+            failed.append(i)
+    return ys, failed
+
+
+def _iter_cast_chunks(results, errors):
+    offset = 0
+    for ys, failed in results:
+        if failed:
+            failed = set(failed)
+            for i, y in enumerate(ys):
+                if i not in failed:
+                    yield y
+                elif errors == "raise":
+                    raise y._prepend_path(offset + i)
+                elif errors == "return":
+                    yield y._prepend_path(offset + i)
+        else:
+            yield from ys
+        offset += len(ys)
+
+
+def _cast_split(cast, merge, executor, threshold, chunksize, x):
+    """Cast a list, tuple or dict `x` of at least `threshold` items in chunks of `chunksize` items on `executor`.
+
+    `cast` is the plan of the whole container, which is also applied to each chunk,
+    and `merge` combines the results of the chunks in order.
+    """
+    if not isinstance(x, (list, tuple, dict)) or len(x) < threshold:
+        return cast(x)
+    offsets = range(0, len(x), chunksize)
+    if isinstance(x, dict):
+        items = list(x.items())
+        return merge(
+            executor.map(cast, [dict(items[i : i + chunksize]) for i in offsets])
+        )
+    return merge(
+        executor.map(
+            functools.partial(_cast_sequence_chunk, cast),
+            offsets,
+            [x[i : i + chunksize] for i in offsets],
+        )
+    )
+
+
+def _cast_sequence_chunk(cast, offset, xs):
+    try:
+        return cast(xs)
+    except CastingError as e:
+        # Shift the index of the item in the chunk to that in the whole sequence.
+        e._reversed_path[-1] += offset
+        raise
+
+
+def _merge_chunks(make, chunks):
+    return make(itertools.chain.from_iterable(chunks))
+
+
+def _merge_dicts(chunks):
+    y = {}
+    for chunk in chunks:
+        y.update(chunk)
+    return y
+
+
+def _cast_many_list(cast, xs, errors):
+    if errors == "raise":
+        return _analyze_list(cast, xs)
+    return list(_cast_many(cast, xs, errors))
+
+
+def _check_kwargs(cls, fields: dict[str, Any], required_key_set: set[str], x):
+    if not isinstance(x, dict):
+        raise CastingError(value=x, cls=cls)
+    x_key_set = set(x)
+    if not (required_key_set.issubset(x_key_set) and x_key_set.issubset(fields)):
+        raise CastingError(value=x, cls=cls)
+    for k, f in fields.items():
+        if k in x:
+            try:
+                f(x[k])
+            except CastingError as e:
+                raise e._prepend_path(k)
+    return x
+
+
+def _analyze_deferred(cell, x):
+    return cell[0](x)
 
 
 def _identity1(x):
@@ -189,11 +1149,341 @@ def _identity1(x):
 
 def _cast_kwargs(cls, fields: dict[str, Any], required_key_set: set[str], x):
     if not isinstance(x, dict):
-        raise CastingError(f"{x}: {type(x)} is not compatible with {cls}")
+        raise CastingError(value=x, cls=cls)
     x_key_set = set(x)
     if not (required_key_set.issubset(x_key_set) and x_key_set.issubset(fields)):
-        raise CastingError(f"{x}: {type(x)} is not compatible with {cls}")
+        raise CastingError(value=x, cls=cls)
+    # The fields are cast in the order of their declaration, like the generated code.
     kwargs = {}
-    for k, v in x.items():
-        kwargs[k] = fields[k](v)
+    for k, f in fields.items():
+        if k in x:
+            try:
+                kwargs[k] = f(x[k])
+            except CastingError as e:
+                raise e._prepend_path(k)
     return cls(**kwargs)
+
+
+def _cast_kwargs_direct(
+    cls, fields, required_key_set, defaults, factories, setattr_, x
+):
+    """`_cast_kwargs` for dataclasses, constructed without calling `__init__`.
+
+    The fields missing from `x` are filled from `defaults` or by calling `factories`.
+    The fields are stored in `__dict__`, or set by `object.__setattr__` if `setattr_`,
+    which, like `__init__`, goes through slots and other descriptors.
+    """
+    if not isinstance(x, dict):
+        raise CastingError(value=x, cls=cls)
+    x_key_set = set(x)
+    if not (required_key_set.issubset(x_key_set) and x_key_set.issubset(fields)):
+        raise CastingError(value=x, cls=cls)
+    values = {}
+    for k, f in fields.items():
+        if k in x:
+            try:
+                values[k] = f(x[k])
+            except CastingError as e:
+                raise e._prepend_path(k)
+        elif k in defaults:
+            values[k] = defaults[k]
+        else:
+            values[k] = factories[k]()
+    y = object.__new__(cls)
+    if setattr_:
+        for k, v in values.items():
+            object.__setattr__(y, k, v)
+    else:
+        y.__dict__.update(values)
+    return y
+
+
+_codegen_counter = itertools.count()
+
+
+def _inline_check(caster):
+    """Return `types` if `caster` returns `x` as is when `isinstance(x, types)`, or `None`.
+
+    `caster` must still be called for the other inputs, which it converts or rejects.
+    """
+    if caster is _identity1:
+        return ()
+    elif caster is _analyze_float:
+        return (int, float)
+    elif caster is _analyze_complex:
+        return (int, float, complex)
+    elif (
+        isinstance(caster, functools.partial)
+        and caster.func is _analyze_type
+        and not caster.keywords
+    ):
+        return caster.args[0]
+    else:
+        return None
+
+
+def _generate_cast_kwargs(
+    cls, fields, required_key_set, call_cls, validate=False, direct=None
+):
+    """Generate a straight-line equivalent of `functools.partial(_cast_kwargs, cls, fields, required_key_set)`.
+
+    With `validate`, generate an equivalent of `_check_kwargs` instead.
+    With `direct=(defaults, factories, setattr_)`, generate an equivalent of `_cast_kwargs_direct`,
+    assigning the fields of the dataclass `cls` without calling `__init__`.
+    `isinstance` checks of field casters are inlined and the casters are only called if the checks fail.
+    If `call_cls` is false, `cls` is a TypedDict and the kwargs dict is returned as is.
+    """
+    name = "_cast_" + re.sub(r"\W", "_", getattr(cls, "__qualname__", "fn"))
+    namespace = dict(
+        CastingError=CastingError,
+        _cls=cls,
+        _required=frozenset(required_key_set),
+        _names=frozenset(fields),
+    )
+    lines = [
+        f"def {name}(x):",
+        "    if not isinstance(x, dict):",
+        "        raise CastingError(value=x, cls=_cls)",
+        "    keys = x.keys()",
+        "    if not (keys >= _required and keys <= _names):",
+        "        raise CastingError(value=x, cls=_cls)",
+    ]
+    all_required = all(k in required_key_set for k in fields)
+    keyword_call = (
+        not validate
+        and direct is None
+        and call_cls
+        and all_required
+        and all(k.isidentifier() and not keyword.iskeyword(k) for k in fields)
+    )
+    build_kwargs = not (validate or keyword_call or direct)
+    if build_kwargs:
+        lines.append("    kwargs = {}")
+    for i, (k, caster) in enumerate(fields.items()):
+        namespace[f"_f{i}"] = caster
+        check = _inline_check(caster)
+        body = [f"v{i} = x[{k!r}]"]
+        convert = [
+            "try:",
+            f"    v{i} = _f{i}(v{i})",
+            "except CastingError as e:",
+            f"    raise e._prepend_path({k!r})",
+        ]
+        if check is None:
+            body.extend(convert)
+        elif check != ():
+            namespace[f"_t{i}"] = check
+            body.append(f"if not isinstance(v{i}, _t{i}):")
+            body.extend("    " + line for line in convert)
+        if build_kwargs:
+            body.append(f"kwargs[{k!r}] = v{i}")
+        if k in required_key_set:
+            lines.extend("    " + line for line in body)
+        else:
+            lines.append(f"    if {k!r} in x:")
+            lines.extend("        " + line for line in body)
+            if direct is not None:
+                lines.append("    else:")
+                if k in direct[0]:
+                    namespace[f"_d{i}"] = direct[0][k]
+                    lines.append(f"        v{i} = _d{i}")
+                else:
+                    namespace[f"_d{i}"] = direct[1][k]
+                    lines.append(f"        v{i} = _d{i}()")
+    if validate:
+        lines.append("    return x")
+    elif direct is not None:
+        namespace["_new"] = object.__new__
+        namespace["_setattr"] = object.__setattr__
+        lines.append("    y = _new(_cls)")
+        if direct[2]:
+            lines.extend(f"    _setattr(y, {k!r}, v{i})" for i, k in enumerate(fields))
+        else:
+            values = ", ".join(f"{k!r}: v{i}" for i, k in enumerate(fields))
+            lines.append(f"    y.__dict__.update({{{values}}})")
+        lines.append("    return y")
+    elif keyword_call:
+        args = ", ".join(f"{k}=v{i}" for i, k in enumerate(fields))
+        lines.append(f"    return _cls({args})")
+    elif call_cls:
+        lines.append("    return _cls(**kwargs)")
+    else:
+        lines.append("    return kwargs")
+    source = "\n".join(lines) + "\n"
+    filename = f"<type_casting generated {name} {next(_codegen_counter)}>"
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    exec(builtins.compile(source, filename, "exec"), namespace)
+    return namespace[name]
+
+
+_scan_once = json.scanner.make_scanner(json.JSONDecoder())
+
+
+class _JSONTokens:
+    """A pull tokenizer over a text or binary file object holding a JSON document.
+
+    Only the unconsumed part of the document is buffered.
+    Whole values are decoded with the C scanner of `json`, refilling the buffer while they are truncated.
+    """
+
+    def __init__(self, fileobj, chunk_size=1 << 16):
+        self._read = fileobj.read
+        self._chunk_size = chunk_size
+        self._decode = None
+        self._s = ""
+        self._i = 0
+        self._eof = False
+
+    def _fill(self, size):
+        while not self._eof:
+            chunk = self._read(size)
+            if isinstance(chunk, (bytes, bytearray)):
+                if self._decode is None:
+                    self._decode = codecs.getincrementaldecoder("utf-8-sig")().decode
+                self._eof = not chunk
+                chunk = self._decode(chunk, self._eof)
+            else:
+                self._eof = not chunk
+            if chunk:
+                self._s = self._s[self._i :] + chunk
+                self._i = 0
+                return True
+        return False
+
+    def _error(self, message):
+        return json.JSONDecodeError(message, self._s, self._i)
+
+    def peek(self):
+        """Skip whitespace and return the next character, or `""` at the end."""
+        while True:
+            self._i = json.decoder.WHITESPACE.match(self._s, self._i).end()
+            if self._i < len(self._s):
+                return self._s[self._i]
+            if not self._fill(self._chunk_size):
+                return ""
+
+    def take(self):
+        """Consume the character returned by `peek`."""
+        self._i += 1
+
+    def value(self):
+        """Decode the next whole JSON value."""
+        self.peek()
+        size = self._chunk_size
+        while True:
+            try:
+                value, end = _scan_once(self._s, self._i)
+                # A number may continue with a fraction or an exponent in the next chunk.
+                if (
+                    self._eof
+                    or end + 2 < len(self._s)
+                    or (end < len(self._s) and not isinstance(value, (int, float)))
+                ):
+                    self._i = end
+                    return value
+            except StopIteration as e:
+                if self._eof:
+                    self._i = e.value
+                    raise self._error("Expecting value") from None
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill(size)
+            size *= 2
+
+    def key(self):
+        """Decode an object key and the following colon."""
+        if self.peek() != '"':
+            raise self._error("Expecting property name enclosed in double quotes")
+        k = self.value()
+        if self.peek() != ":":
+            raise self._error("Expecting ':' delimiter")
+        self.take()
+        return k
+
+    def end_of(self, closer):
+        """Consume a comma and return `False`, or consume `closer` and return `True`."""
+        c = self.peek()
+        self.take()
+        if c == ",":
+            return False
+        elif c == closer:
+            return True
+        self._i -= 1
+        raise self._error(f"Expecting ',' delimiter or '{closer}'")
+
+
+def _read_document(read, fileobj):
+    tokens = _JSONTokens(fileobj)
+    y = read(tokens)
+    if tokens.peek() != "":
+        raise tokens._error("Extra data")
+    return y
+
+
+def _read_value(cast, tokens):
+    return cast(tokens.value())
+
+
+def _read_kwargs(cls, fields, required_key_set, call_cls, cast, tokens):
+    if tokens.peek() != "{":
+        return cast(tokens.value())
+    tokens.take()
+    kwargs = {}
+    if tokens.peek() == "}":
+        tokens.take()
+    else:
+        while True:
+            k = tokens.key()
+            if k not in fields:
+                kwargs[k] = tokens.value()
+                raise CastingError(value=kwargs, cls=cls)
+            try:
+                kwargs[k] = fields[k](tokens)
+            except CastingError as e:
+                raise e._prepend_path(k)
+            if tokens.end_of("}"):
+                break
+    if not kwargs.keys() >= required_key_set:
+        raise CastingError(value=kwargs, cls=cls)
+    if call_cls:
+        return cls(**kwargs)
+    # The fields are cast in the order of the document, but returned in that of `fields`.
+    return {k: kwargs[k] for k in fields if k in kwargs}
+
+
+def _read_sequence(make, read, cast, tokens):
+    if tokens.peek() != "[":
+        return cast(tokens.value())
+    tokens.take()
+    y = []
+    if tokens.peek() == "]":
+        tokens.take()
+    else:
+        while True:
+            try:
+                y.append(read(tokens))
+            except CastingError as e:
+                raise e._prepend_path(len(y))
+            if tokens.end_of("]"):
+                break
+    return y if make is list else make(y)
+
+
+def _read_mapping(kcls, read, cast, tokens):
+    if tokens.peek() != "{":
+        return cast(tokens.value())
+    tokens.take()
+    y = {}
+    if tokens.peek() == "}":
+        tokens.take()
+    else:
+        while True:
+            k = tokens.key()
+            try:
+                y[kcls(k)] = read(tokens)
+            except CastingError as e:
+                raise e._prepend_path(k)
+            if tokens.end_of("}"):
+                break
+    return y
@@ -1,121 +1,617 @@
+import array
 import collections
 import dataclasses
 import decimal
+import enum
 import functools
+import inspect
+import numbers
+import sys
+import threading
 import typing
+import weakref
 from types import UnionType
-from typing import Any, Literal, Union
+from typing import Annotated, Any, Literal, Union
 
 from .._common import (
+    CacheInfo,
     Call,
     CastingError,
     EmptyDict,
     EmptyTuple,
     GetAttr,
+    NodeStats,
     _analyze__CallWithArgsAndKwargs,
     _analyze__CallWithInspect,
+    _analyze_array,
     _analyze_complex,
     _analyze_Decimal,
+    _analyze_deferred,
     _analyze_deque,
     _analyze_dict,
+    _analyze_eager_iterator,
+    _analyze_Enum,
     _analyze_float,
     _analyze_GetAttr,
+    _analyze_GetAttr_with_import,
+    _analyze_instrumented,
+    _analyze_iterator,
     _analyze_list,
     _analyze_Literal,
+    _analyze_NamedTuple,
+    _analyze_ndarray,
+    _analyze_scalars,
+    _analyze_ScreenedUnion,
     _analyze_set,
     _analyze_tuple,
     _analyze_type,
-    _analyze_Union,
+    _analyze_variadic_tuple,
     _CallWithArgsAndKwargs,
     _CallWithInspect,
     _cast_kwargs,
+    _cast_kwargs_direct,
+    _cast_many,
+    _cast_many_list,
+    _cast_many_parallel,
+    _cast_split,
+    _check__CallWithArgsAndKwargs,
+    _check__CallWithInspect,
+    _check_Decimal,
+    _check_dict,
+    _check_iterable,
+    _check_iterator,
+    _check_kwargs,
+    _check_scalars,
+    _check_tuple,
+    _conversions_key,
+    _DispatchUnion,
+    _encode_Decimal,
+    _encode_dict,
+    _encode_float,
+    _encode_hooked,
+    _encode_int,
+    _encode_key,
+    _encode_list,
+    _encode_object,
+    _encode_plain,
+    _encode_str,
+    _encode_tolist,
+    _encode_tuple,
+    _encode_typeddict,
+    _generate_cast_kwargs,
     _identity1,
+    _inline_check,
+    _is_any_of,
+    _is_collection_of,
+    _is_dict_of,
+    _is_instance,
+    _is_literal,
+    _is_number_type,
+    _is_tuple_of,
+    _is_typeddict,
+    _literal_index,
+    _merge_chunks,
+    _merge_dicts,
+    _PlanCache,
+    _read_document,
+    _read_kwargs,
+    _read_mapping,
+    _read_sequence,
+    _read_value,
+    _resolved,
+    _uncast_dict,
+    _uncast_Enum,
+    _uncast_list,
+    _uncast_object,
+    _uncast_tolist,
+    _uncast_tuple,
+    _uncast_typeddict,
+    _UnionMember,
+    _UnionScreen,
     override,
 )
 
+_plan_cache = _PlanCache(maxsize=1024)
 
-def cast(cls, x, implicit_conversions=None):
-    return _analyze(cls, {} if implicit_conversions is None else implicit_conversions)(
-        x
-    )
+_BACKENDS = ("partial", "codegen")
+_CONSTRUCTS = ("init", "direct")
 
 
-def _analyze(cls, implicit_conversions):
-    if cls in implicit_conversions:
-        return implicit_conversions[cls]
-    elif dataclasses.is_dataclass(cls):
-        fields = dataclasses.fields(cls)
+class _Context:
+    """Options shared by every node of one analysis."""
+
+    def __init__(
+        self,
+        implicit_conversions,
+        backend="partial",
+        import_modules=False,
+        validate=False,
+        stats=None,
+        enum_names=False,
+        construct="init",
+    ):
+        if backend not in _BACKENDS:
+            raise ValueError(f"Unsupported backend {backend}: {_BACKENDS}")
+        if construct not in _CONSTRUCTS:
+            raise ValueError(f"Unsupported construct {construct}: {_CONSTRUCTS}")
+        self.implicit_conversions = implicit_conversions
+        self.backend = backend
+        self.import_modules = import_modules
+        self.validate = validate
+        self.stats = stats
+        self.enum_names = enum_names
+        self.construct = construct
+        # Plans of dataclasses and TypedDicts keyed by `(analyze, cls)`, see `_once`.
+        self.plans = {}
+
+    def instrument(self, label, node):
+        """Wrap `node` to record its stats under `label` if instrumented."""
+        if self.stats is None:
+            return node
         return functools.partial(
-            _cast_kwargs,
-            cls,
-            {f.name: _analyze(f.type, implicit_conversions) for f in fields},
-            set(
-                f.name
-                for f in fields
-                if (f.default == dataclasses.MISSING)
-                and (f.default_factory == dataclasses.MISSING)
-            ),
+            _analyze_instrumented, self.stats.setdefault(label, [0, 0.0, 0]), node
         )
-    elif typing.is_typeddict(cls):
-        return functools.partial(
-            _cast_kwargs,
+
+
+class Caster:
+    """A reusable caster for `cls` returned by `compile`.
+
+    `backend="partial"` builds a tree of `functools.partial`s.
+    `backend="codegen"` additionally generates a straight-line function for each dataclass and TypedDict.
+    With `import_modules`, `GetAttr` and `Call` import the modules of the paths they resolve if needed.
+    Casters are pickled as `cls` and the options, and compiled again when unpickled,
+    so `cls` and the implicit conversions must be picklable by reference (defined at the top level of a module).
+    `check` and `validate` run a plan that performs the same checks without constructing dataclasses, containers or calls.
+    With `instrument`, the dataclasses, TypedDicts, union members and implicit conversions record
+    their calls, cumulative time and `CastingError`s, which `stats` returns.
+    Otherwise, the plan is the same as the uninstrumented one.
+    With `enum_names`, Enums also accept the names of their members.
+    With `construct="direct"`, dataclasses whose `__init__` only assigns their fields
+    (no `__post_init__`, `InitVar`, `init=False` field, or custom `__init__`, `__new__` or `__setattr__`)
+    are allocated by `object.__new__` and their fields are assigned directly.
+    """
+
+    def __init__(
+        self,
+        cls,
+        implicit_conversions=None,
+        *,
+        backend="partial",
+        import_modules=False,
+        instrument=False,
+        enum_names=False,
+        construct="init",
+    ):
+        self.cls = cls
+        self.implicit_conversions = (
+            {} if implicit_conversions is None else dict(implicit_conversions)
+        )
+        self.backend = backend
+        self.import_modules = import_modules
+        self.instrument = instrument
+        self.enum_names = enum_names
+        self.construct = construct
+        self._ctx = _Context(
+            self.implicit_conversions,
+            backend,
+            import_modules,
+            stats={} if instrument else None,
+            enum_names=enum_names,
+            construct=construct,
+        )
+        self._cast = _analyze(cls, self._ctx)
+        self._read = None
+        self._validate = None
+
+    def __call__(self, x):
+        return self._cast(x)
+
+    def stats(self):
+        """Return a snapshot of `{label: NodeStats(calls, time, failures)}` of an instrumented caster.
+
+        Nodes of the same label share their stats, and the time of a node includes that of the nodes nested in it.
+        Counts may be lost if the caster is called concurrently.
+        """
+        if self._ctx.stats is None:
+            raise ValueError(f"{self!r} is not instrumented")
+        return {
+            label: NodeStats(*stats) for label, stats in list(self._ctx.stats.items())
+        }
+
+    def check(self, x):
+        """Return whether `x` can be cast to `cls`."""
+        try:
+            self.validate(x)
+        except CastingError:
+            return False
+        return True
+
+    def validate(self, x):
+        """Raise the `CastingError` that casting `x` to `cls` would raise, if any."""
+        if self._validate is None:
+            self._validate = _analyze(
+                self.cls,
+                _Context(
+                    self.implicit_conversions,
+                    self.backend,
+                    self.import_modules,
+                    validate=True,
+                    enum_names=self.enum_names,
+                ),
+            )
+        self._validate(x)
+
+    def cast_json_stream(self, fileobj):
+        if self._read is None:
+            self._read = _analyze_stream(self.cls, self._ctx)
+        return _read_document(self._read, fileobj)
+
+    def many(self, xs, *, errors="raise", executor=None, chunksize=1024):
+        if executor is not None:
+            return _cast_many_parallel(self, xs, errors, executor, chunksize)
+        return _cast_many(self._cast, xs, errors)
+
+    def many_list(self, xs, *, errors="raise", executor=None, chunksize=1024):
+        if executor is not None:
+            return list(_cast_many_parallel(self, xs, errors, executor, chunksize))
+        return _cast_many_list(self._cast, xs, errors)
+
+    def parallel(self, x, executor, *, threshold=8192, chunksize=None):
+        """Cast a top-level list, tuple or dict `x` in chunks on a `concurrent.futures.Executor`.
+
+        Inputs of less than `threshold` items, and targets other than lists, sets, deques,
+        variadic tuples and dicts, are cast sequentially.
+        The chunks have `chunksize` items (`threshold` by default).
+        This is meant for thread pools on free-threaded builds of CPython,
+        since the chunks are cast in parallel only if the GIL is disabled.
+        """
+        merge = _split_merge(self.cls, self._ctx)
+        if merge is None:
+            return self._cast(x)
+        return _cast_split(
+            self._cast,
+            merge,
+            executor,
+            threshold,
+            threshold if chunksize is None else chunksize,
+            x,
+        )
+
+    def __reduce__(self):
+        return _unpickle_caster, (
+            self.cls,
+            self.implicit_conversions,
+            self._options(),
+        )
+
+    def _options(self):
+        return dict(
+            backend=self.backend,
+            import_modules=self.import_modules,
+            instrument=self.instrument,
+            enum_names=self.enum_names,
+            construct=self.construct,
+        )
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.cls})"
+
+
+# Unpickled casters are kept apart from the plans of `cast`, e.g., for executor workers.
+_unpickled_casters = _PlanCache(maxsize=64)
+
+
+def _unpickle_caster(cls, implicit_conversions, options):
+    """Rebuild a pickled `Caster`, sharing it with the others unpickled in this process.
+
+    Instrumented casters are not shared, since each of them records its own stats.
+    """
+    if options.get("instrument"):
+        return Caster(cls, implicit_conversions, **options)
+    try:
+        conversions = _conversions_key(implicit_conversions)
+    except TypeError:
+        return Caster(cls, implicit_conversions, **options)
+    options_key = tuple(sorted(options.items()))
+    return _unpickled_casters.get(
+        (cls, conversions, options_key),
+        lambda: Caster(cls, implicit_conversions, **options),
+        lambda: (_type_key(cls), conversions, options_key),
+    )
+
+
+def compile(
+    cls,
+    implicit_conversions=None,
+    *,
+    backend="partial",
+    import_modules=False,
+    instrument=False,
+    enum_names=False,
+    construct="init",
+):
+    return Caster(
+        cls,
+        implicit_conversions,
+        backend=backend,
+        import_modules=import_modules,
+        instrument=instrument,
+        enum_names=enum_names,
+        construct=construct,
+    )
+
+
+def cast(cls, x, implicit_conversions=None, *, import_modules=False):
+    return _cached_plan(cls, implicit_conversions, import_modules)(x)
+
+
+def check(cls, x, implicit_conversions=None, *, import_modules=False):
+    """Return whether `x` can be cast to `cls`, without constructing the result.
+
+    The elements of one-shot iterators are not checked, so that they are left unconsumed for casting.
+    Only `CastingError`s are caught; the other exceptions raised by implicit conversions or calls propagate.
+    """
+    try:
+        _cached_plan(cls, implicit_conversions, import_modules, validate=True)(x)
+    except CastingError:
+        return False
+    return True
+
+
+def cast_many(
+    cls,
+    xs,
+    implicit_conversions=None,
+    *,
+    errors="raise",
+    import_modules=False,
+    executor=None,
+    chunksize=1024,
+):
+    """Lazily cast each item of `xs` with a single plan.
+
+    `errors="raise"` raises the first `CastingError`, with the index of the item prepended to its path.
+    `errors="skip"` drops the items that failed and `errors="return"` yields their `CastingError`s instead.
+    With a `concurrent.futures.Executor`, `xs` is consumed at once and cast in chunks of `chunksize` items
+    by a pickled `Caster`, and the results are yielded in the order of `xs`.
+    """
+    if executor is not None:
+        return _cast_many_parallel(
+            Caster(cls, implicit_conversions, import_modules=import_modules),
+            xs,
+            errors,
+            executor,
+            chunksize,
+        )
+    return _cast_many(
+        _cached_plan(cls, implicit_conversions, import_modules), xs, errors
+    )
+
+
+def cast_many_list(
+    cls,
+    xs,
+    implicit_conversions=None,
+    *,
+    errors="raise",
+    import_modules=False,
+    executor=None,
+    chunksize=1024,
+):
+    """The eager version of `cast_many` returning a list."""
+    if executor is not None:
+        return list(
+            cast_many(
+                cls,
+                xs,
+                implicit_conversions,
+                errors=errors,
+                import_modules=import_modules,
+                executor=executor,
+                chunksize=chunksize,
+            )
+        )
+    return _cast_many_list(
+        _cached_plan(cls, implicit_conversions, import_modules), xs, errors
+    )
+
+
+def cast_json_stream(cls, fileobj, implicit_conversions=None, *, import_modules=False):
+    """Cast the JSON document read from a text or binary `fileobj` to `cls`.
+
+    Dataclasses, TypedDicts and containers are built directly from the tokens of the document,
+    so only the values of the other types are decoded to plain Python objects before being cast.
+    """
+    return _read_document(
+        _cached_plan(cls, implicit_conversions, import_modules, _analyze_stream),
+        fileobj,
+    )
+
+
+def uncast(cls, x, hooks=None):
+    """Convert `x`, an instance of `cls`, back to JSON-compatible dicts, lists and scalars.
+
+    Dataclasses and TypedDicts become dicts, `Decimal`s become strings,
+    and sets, deques, tuples, arrays and NumPy arrays become lists.
+    `hooks` maps types to the functions converting their values, taking precedence over the defaults.
+    The plan follows `cls`, so members of unions are the only values whose types are inspected.
+    """
+    return _cached_plan(cls, hooks, False, _analyze_uncast)(x)
+
+
+def encode_json(cls, x, hooks=None):
+    """Encode `x`, an instance of `cls`, to compact JSON bytes without building the `uncast` tree first.
+
+    The output is that of `json.dumps(uncast(cls, x, hooks), separators=(",", ":")).encode()`,
+    but each value is encoded by the encoder its type in `cls` selects.
+    """
+    return _cached_plan(cls, hooks, False, _analyze_encode)(x).encode()
+
+
+def dump_json(cls, x, fp, hooks=None):
+    """Write `encode_json(cls, x, hooks)` to a binary file object `fp`."""
+    fp.write(encode_json(cls, x, hooks))
+
+
+def _cached_plan(
+    cls, implicit_conversions, import_modules, analyze=None, *, validate=False
+):
+    if analyze is None:
+        analyze = _analyze
+
+    def make():
+        ctx = _Context(
+            {} if implicit_conversions is None else dict(implicit_conversions),
+            import_modules=import_modules,
+            validate=validate,
+        )
+        return analyze(cls, ctx)
+
+    try:
+        conversions = (
+            _no_conversions
+            if implicit_conversions is None
+            else _conversions_key(implicit_conversions)
+        )
+    except TypeError:
+        return make()
+    return _plan_cache.get(
+        (analyze, cls, conversions, import_modules, validate),
+        make,
+        lambda: (analyze, _type_key(cls), conversions, import_modules, validate),
+    )
+
+
+_no_conversions = frozenset()
+
+
+def _type_key(cls):
+    """Return `cls`, or a key telling apart the orders of the unions in it."""
+    args = typing.get_args(cls)
+    if not args:
+        return cls
+    keys = tuple(_type_key(arg) for arg in args)
+    if typing.get_origin(cls) in (Union, UnionType) or any(
+        key is not arg for key, arg in zip(keys, args)
+    ):
+        return (cls, keys)
+    return cls
+
+
+def cast_cache_info():
+    return _plan_cache.info()
+
+
+def cast_cache_clear():
+    _plan_cache.clear()
+    _unpickled_casters.clear()
+    _resolved.clear()
+    with _kwargs_fields_lock:
+        _kwargs_fields_memo.clear()
+
+
+def _analyze(cls, ctx):
+    if cls in ctx.implicit_conversions:
+        return ctx.instrument(
+            f"implicit_conversions[{_label(cls)}]", ctx.implicit_conversions[cls]
+        )
+    elif kwargs_fields := _kwargs_fields(cls):
+        types, required_key_set = kwargs_fields
+        return _once(
+            _analyze,
             cls,
-            {
-                k: _analyze(v, implicit_conversions)
-                for k, v in typing.get_type_hints(cls).items()
-            },
-            set(typing.get_type_hints(cls)) if cls.__total__ else set(),
+            ctx,
+            lambda: ctx.instrument(
+                _label(cls),
+                _analyze_kwargs(
+                    cls,
+                    {k: _analyze(v, ctx) for k, v in types.items()},
+                    required_key_set,
+                    dataclasses.is_dataclass(cls),
+                    ctx,
+                ),
+            ),
         )
     elif cls == Any:
         return _identity1
+    elif isinstance(cls, enum.EnumMeta):
+        return _analyze_enum(cls, ctx)
+    elif _is_namedtuple(cls):
+        return _once(
+            _analyze,
+            cls,
+            ctx,
+            lambda: functools.partial(
+                _analyze_NamedTuple,
+                cls,
+                {k: _analyze(v, ctx) for k, v in _namedtuple_types(cls).items()},
+                cls._field_defaults,
+            ),
+        )
     elif cls == decimal.Decimal:
-        return _analyze_Decimal
+        return _check_Decimal if ctx.validate else _analyze_Decimal
     elif cls == complex:
         return _analyze_complex
     elif cls == float:
         return _analyze_float
+    elif ndarray_spec := _ndarray_spec(cls):
+        return functools.partial(
+            _analyze_ndarray, sys.modules["numpy"], *ndarray_spec, str(cls)
+        )
     elif origin := typing.get_origin(cls):
         if origin == GetAttr:
             return functools.partial(
-                _analyze_GetAttr, _analyze(cls.__args__[0], implicit_conversions)
+                (
+                    _analyze_GetAttr_with_import
+                    if ctx.import_modules
+                    else _analyze_GetAttr
+                ),
+                _analyze(cls.__args__[0], ctx),
             )
         elif origin == _CallWithArgsAndKwargs:
             path, args, kwargs = cls.__args__
             return functools.partial(
-                _analyze__CallWithArgsAndKwargs,
+                (
+                    _check__CallWithArgsAndKwargs
+                    if ctx.validate
+                    else _analyze__CallWithArgsAndKwargs
+                ),
                 str(cls),
-                _analyze(GetAttr[path], implicit_conversions),
-                _analyze(args, implicit_conversions),
-                _analyze(kwargs, implicit_conversions),
+                _analyze(GetAttr[path], ctx),
+                _analyze(args, ctx),
+                _analyze(kwargs, ctx),
             )
         elif origin == _CallWithInspect:
             path = cls.__args__[0]
             return functools.partial(
-                _analyze__CallWithInspect,
+                _check__CallWithInspect if ctx.validate else _analyze__CallWithInspect,
                 str(cls),
                 _analyze,
-                implicit_conversions,
-                _analyze(GetAttr[path], implicit_conversions),
+                ctx,
+                weakref.WeakKeyDictionary(),
+                _analyze(GetAttr[path], ctx),
             )
         elif origin == Literal:
-            return functools.partial(_analyze_Literal, str(cls), cls.__args__)
+            return functools.partial(
+                _analyze_Literal, str(cls), *_literal_index(cls.__args__)
+            )
         elif origin in (
             set,
             collections.abc.Set,
             collections.abc.MutableSet,
         ):
-            return functools.partial(
-                _analyze_set, _analyze(cls.__args__[0], implicit_conversions)
-            )
+            return _analyze_collection(_analyze_set, set, cls.__args__[0], ctx)
         elif origin in (
             list,
             collections.abc.Sequence,
             collections.abc.MutableSequence,
-            collections.abc.Iterable,
-            collections.abc.Iterator,
         ):
+            return _analyze_collection(_analyze_list, list, cls.__args__[0], ctx)
+        elif origin in (collections.abc.Iterable, collections.abc.Iterator):
             return functools.partial(
-                _analyze_list, _analyze(cls.__args__[0], implicit_conversions)
+                _check_iterator if ctx.validate else _analyze_iterator,
+                str(cls),
+                _analyze(cls.__args__[0], ctx),
             )
         elif origin in (
             dict,
@@ -123,29 +619,779 @@ def _analyze(cls, implicit_conversions):
             collections.abc.MutableMapping,
         ):
             return functools.partial(
-                _analyze_dict,
-                _analyze(cls.__args__[0], implicit_conversions),
-                _analyze(cls.__args__[1], implicit_conversions),
+                _check_dict if ctx.validate else _analyze_dict,
+                _analyze(cls.__args__[0], ctx),
+                _analyze(cls.__args__[1], ctx),
             )
         elif origin == collections.deque:
-            return functools.partial(
-                _analyze_deque, _analyze(cls.__args__[0], implicit_conversions)
+            return _analyze_collection(
+                _analyze_deque, collections.deque, cls.__args__[0], ctx
+            )
+        elif origin == tuple and len(cls.__args__) == 2 and cls.__args__[1] == ...:
+            return _analyze_collection(
+                _analyze_variadic_tuple, tuple, cls.__args__[0], ctx
             )
         elif origin == tuple:
             return functools.partial(
-                _analyze_tuple,
+                _check_tuple if ctx.validate else _analyze_tuple,
                 str(cls),
-                tuple(_analyze(vcls, implicit_conversions) for vcls in cls.__args__),
+                tuple(_analyze(vcls, ctx) for vcls in cls.__args__),
+            )
+        elif origin in (Union, UnionType):
+            return _analyze_union(cls, ctx)
+        elif origin == Annotated:
+            return _analyze_Annotated(cls, ctx)
+        else:
+            raise ValueError(f"Unsupported class {cls}: {type(cls)}")
+    elif isinstance(cls, type):
+        return functools.partial(_analyze_type, cls)
+    else:
+        raise ValueError(f"Unsupported class {cls}: {type(cls)}")
+
+
+def _analyze_enum(cls, ctx):
+    members = {}
+    fallback = _defines_missing(cls)
+    for member in cls.__members__.values():
+        try:
+            members.setdefault(member.value, member)
+        except TypeError:
+            # Unhashable values are left to `cls(x)`.
+            fallback = True
+    return functools.partial(
+        _analyze_Enum,
+        cls,
+        members,
+        dict(cls.__members__) if ctx.enum_names else None,
+        fallback,
+    )
+
+
+def _is_namedtuple(cls):
+    return isinstance(cls, type) and issubclass(cls, tuple) and hasattr(cls, "_fields")
+
+
+def _namedtuple_types(cls):
+    hints = _type_hints(cls)
+    return {k: hints.get(k, Any) for k in cls._fields}
+
+
+def _defines_missing(cls):
+    return cls._missing_.__func__ is not enum.Enum._missing_.__func__
+
+
+def _label(cls):
+    return cls.__qualname__ if type(cls) is type else str(cls)
+
+
+def _analyze_collection(analyze_collection, make, vcls, ctx):
+    vcls = _analyze(vcls, ctx)
+    check = _inline_check(vcls)
+    if check is None or not all(
+        type(t) is type for t in (check if isinstance(check, tuple) else (check,))
+    ):
+        return functools.partial(
+            _check_iterable if ctx.validate else analyze_collection, vcls
+        )
+    if ctx.validate:
+        return functools.partial(_check_scalars, check, vcls)
+    return functools.partial(_analyze_scalars, make, check, vcls)
+
+
+def _analyze_Annotated(cls, ctx):
+    base = cls.__origin__
+    if base == array.array:
+        if not (len(cls.__metadata__) == 1 and cls.__metadata__[0] in array.typecodes):
+            raise ValueError(
+                f"Annotated[array.array, typecode] is expected for {cls}: {array.typecodes}"
+            )
+        return functools.partial(_analyze_array, cls.__metadata__[0], str(cls))
+    return _analyze(base, ctx)
+
+
+def _ndarray_spec(cls):
+    """Return `(dtype, shape)` if `cls` is `numpy.ndarray`, `numpy.typing.NDArray[dtype]` or `Annotated[numpy.ndarray, dtype, shape]`.
+
+    `shape` is a tuple of sizes, with `None` for any size.
+    """
+    numpy = sys.modules.get("numpy")
+    if numpy is None:
+        return None
+    metadata = ()
+    if typing.get_origin(cls) == Annotated:
+        cls, metadata = cls.__origin__, cls.__metadata__
+    dtype = None
+    if typing.get_origin(cls) is numpy.ndarray:
+        scalar_types = typing.get_args(typing.get_args(cls)[1])
+        if scalar_types and isinstance(scalar_types[0], type):
+            dtype = numpy.dtype(scalar_types[0])
+        cls = numpy.ndarray
+    if cls is not numpy.ndarray:
+        return None
+    shape = None
+    for m in metadata:
+        if isinstance(m, tuple):
+            shape = m
+        else:
+            dtype = numpy.dtype(m)
+    return dtype, shape
+
+
+def _analyze_stream(cls, ctx):
+    """Analyze `cls` into a reader of `_JSONTokens`."""
+    cast = _analyze(cls, ctx)
+    if cls in ctx.implicit_conversions or _ndarray_spec(cls):
+        return functools.partial(_read_value, cast)
+    elif kwargs_fields := _kwargs_fields(cls):
+        types, required_key_set = kwargs_fields
+        return _once(
+            _analyze_stream,
+            cls,
+            ctx,
+            lambda: functools.partial(
+                _read_kwargs,
+                cls,
+                {k: _analyze_stream(v, ctx) for k, v in types.items()},
+                required_key_set,
+                dataclasses.is_dataclass(cls),
+                cast,
+            ),
+        )
+    elif origin := typing.get_origin(cls):
+        if origin == tuple and len(cls.__args__) == 2 and cls.__args__[1] == ...:
+            make = tuple
+        elif origin in (
+            list,
+            collections.abc.Sequence,
+            collections.abc.MutableSequence,
+        ):
+            make = list
+        elif origin in (collections.abc.Iterable, collections.abc.Iterator):
+            make = iter
+        elif origin in (set, collections.abc.Set, collections.abc.MutableSet):
+            make = set
+        elif origin == collections.deque:
+            make = collections.deque
+        elif origin in (dict, collections.abc.Mapping, collections.abc.MutableMapping):
+            return functools.partial(
+                _read_mapping,
+                _analyze(cls.__args__[0], ctx),
+                _analyze_stream(cls.__args__[1], ctx),
+                cast,
+            )
+        elif origin == Annotated and cls.__origin__ != array.array:
+            return _analyze_stream(cls.__origin__, ctx)
+        else:
+            return functools.partial(_read_value, cast)
+        vcls = cls.__args__[0]
+        if _inline_check(_analyze(vcls, ctx)) is not None:
+            # Containers of scalars are decoded at once by the C scanner.
+            return functools.partial(_read_value, cast)
+        return functools.partial(_read_sequence, make, _analyze_stream(vcls, ctx), cast)
+    else:
+        return functools.partial(_read_value, cast)
+
+
+def _analyze_uncast(cls, ctx):
+    """Analyze `cls` into a function converting its instances to JSON-compatible values.
+
+    `ctx.implicit_conversions` holds the hooks, and `None` stands for values returned as is.
+    """
+    uncast = _analyze_uncast_or_none(cls, ctx)
+    return _identity1 if uncast is None else uncast
+
+
+def _analyze_uncast_or_none(cls, ctx):
+    if cls in ctx.implicit_conversions:
+        return ctx.implicit_conversions[cls]
+    elif kwargs_fields := _kwargs_fields(cls):
+        return _once(
+            _analyze_uncast_or_none,
+            cls,
+            ctx,
+            lambda: _analyze_uncast_kwargs(cls, kwargs_fields[0], ctx),
+        )
+    elif cls == decimal.Decimal:
+        return str
+    elif isinstance(cls, enum.EnumMeta):
+        return _uncast_Enum
+    elif _is_namedtuple(cls):
+        return _once(
+            _analyze_uncast_or_none,
+            cls,
+            ctx,
+            lambda: functools.partial(
+                _uncast_tuple,
+                tuple(_analyze_uncast(v, ctx) for v in _namedtuple_types(cls).values()),
+            ),
+        )
+    elif _ndarray_spec(cls):
+        return _uncast_tolist
+    elif origin := typing.get_origin(cls):
+        if origin in (GetAttr, _CallWithArgsAndKwargs, _CallWithInspect):
+            raise ValueError(f"Unsupported class {cls}: {type(cls)}")
+        elif origin == Literal:
+            return None
+        elif origin in (
+            set,
+            collections.abc.Set,
+            collections.abc.MutableSet,
+            list,
+            collections.abc.Sequence,
+            collections.abc.MutableSequence,
+            collections.abc.Iterable,
+            collections.abc.Iterator,
+            collections.deque,
+        ) or (origin == tuple and len(cls.__args__) == 2 and cls.__args__[1] == ...):
+            vcls = _analyze_uncast_or_none(cls.__args__[0], ctx)
+            return list if vcls is None else functools.partial(_uncast_list, vcls)
+        elif origin in (
+            dict,
+            collections.abc.Mapping,
+            collections.abc.MutableMapping,
+        ):
+            kcls = _analyze_uncast(cls.__args__[0], ctx)
+            vcls = _analyze_uncast(cls.__args__[1], ctx)
+            if kcls is _identity1 and vcls is _identity1:
+                return dict
+            return functools.partial(_uncast_dict, kcls, vcls)
+        elif origin == tuple:
+            return functools.partial(
+                _uncast_tuple,
+                tuple(_analyze_uncast(vcls, ctx) for vcls in cls.__args__),
             )
         elif origin in (Union, UnionType):
+            members = tuple(
+                (
+                    _runtime_types(ucls),
+                    _analyze_uncast(ucls, ctx),
+                    _analyze_instance(ucls, ctx),
+                )
+                for ucls in cls.__args__
+            )
+            if all(uncast is _identity1 for _, uncast, _ in members):
+                return None
+            return _DispatchUnion(str(cls), members)
+        elif origin == Annotated:
+            if cls.__origin__ == array.array:
+                return _uncast_tolist
+            return _analyze_uncast_or_none(cls.__origin__, ctx)
+        else:
+            raise ValueError(f"Unsupported class {cls}: {type(cls)}")
+    elif cls == Any or isinstance(cls, type):
+        return None
+    else:
+        raise ValueError(f"Unsupported class {cls}: {type(cls)}")
+
+
+def _analyze_encode(cls, ctx):
+    """Analyze `cls` into a function encoding its instances to JSON text.
+
+    `ctx.implicit_conversions` holds the hooks of `uncast`, whose results are encoded with `json`.
+    """
+    if cls in ctx.implicit_conversions:
+        return functools.partial(_encode_hooked, ctx.implicit_conversions[cls])
+    elif kwargs_fields := _kwargs_fields(cls):
+        return _once(
+            _analyze_encode,
+            cls,
+            ctx,
+            lambda: _analyze_encode_kwargs(cls, kwargs_fields[0], ctx),
+        )
+    elif cls == str:
+        return _encode_str
+    elif cls == int:
+        return _encode_int
+    elif cls == float:
+        return _encode_float
+    elif cls == decimal.Decimal:
+        return _encode_Decimal
+    elif isinstance(cls, enum.EnumMeta):
+        return functools.partial(_encode_hooked, _uncast_Enum)
+    elif _is_namedtuple(cls):
+        return _once(
+            _analyze_encode,
+            cls,
+            ctx,
+            lambda: functools.partial(
+                _encode_tuple,
+                tuple(_analyze_encode(v, ctx) for v in _namedtuple_types(cls).values()),
+            ),
+        )
+    elif _ndarray_spec(cls):
+        return _encode_tolist
+    elif origin := typing.get_origin(cls):
+        if origin in (GetAttr, _CallWithArgsAndKwargs, _CallWithInspect):
+            raise ValueError(f"Unsupported class {cls}: {type(cls)}")
+        elif origin == Literal:
+            return _encode_plain
+        elif origin in (
+            set,
+            collections.abc.Set,
+            collections.abc.MutableSet,
+            list,
+            collections.abc.Sequence,
+            collections.abc.MutableSequence,
+            collections.abc.Iterable,
+            collections.abc.Iterator,
+            collections.deque,
+        ) or (origin == tuple and len(cls.__args__) == 2 and cls.__args__[1] == ...):
             return functools.partial(
-                _analyze_Union,
+                _encode_list, _analyze_encode(cls.__args__[0], ctx)
+            )
+        elif origin in (
+            dict,
+            collections.abc.Mapping,
+            collections.abc.MutableMapping,
+        ):
+            kcls = _analyze_encode(cls.__args__[0], ctx)
+            return functools.partial(
+                _encode_dict,
+                kcls if kcls is _encode_str else functools.partial(_encode_key, kcls),
+                _analyze_encode(cls.__args__[1], ctx),
+            )
+        elif origin == tuple:
+            return functools.partial(
+                _encode_tuple,
+                tuple(_analyze_encode(vcls, ctx) for vcls in cls.__args__),
+            )
+        elif origin in (Union, UnionType):
+            return _DispatchUnion(
                 str(cls),
-                list(_analyze(ucls, implicit_conversions) for ucls in cls.__args__),
+                tuple(
+                    (
+                        _runtime_types(ucls),
+                        _analyze_encode(ucls, ctx),
+                        _analyze_instance(ucls, ctx),
+                    )
+                    for ucls in cls.__args__
+                ),
             )
+        elif origin == Annotated:
+            if cls.__origin__ == array.array:
+                return _encode_tolist
+            return _analyze_encode(cls.__origin__, ctx)
         else:
             raise ValueError(f"Unsupported class {cls}: {type(cls)}")
-    elif isinstance(cls, type):
-        return functools.partial(_analyze_type, cls)
+    elif cls == Any or isinstance(cls, type):
+        return _encode_plain
     else:
         raise ValueError(f"Unsupported class {cls}: {type(cls)}")
+
+
+def _analyze_uncast_kwargs(cls, types, ctx):
+    fields = {k: _analyze_uncast_or_none(v, ctx) for k, v in types.items()}
+    if dataclasses.is_dataclass(cls):
+        return functools.partial(_uncast_object, tuple(fields.items()))
+    return functools.partial(_uncast_typeddict, fields)
+
+
+def _analyze_encode_kwargs(cls, types, ctx):
+    fields = {k: _analyze_encode(v, ctx) for k, v in types.items()}
+    prefixes = {k: _encode_str(k) + ":" for k in fields}
+    if dataclasses.is_dataclass(cls):
+        return functools.partial(
+            _encode_object, tuple((k, prefixes[k], f) for k, f in fields.items())
+        )
+    return functools.partial(_encode_typeddict, prefixes, fields)
+
+
+def _runtime_types(cls):
+    """Return the types of the instances of `cls`, for `_DispatchUnion`."""
+    if dataclasses.is_dataclass(cls):
+        return (cls,)
+    elif typing.is_typeddict(cls):
+        return (dict,)
+    elif cls == Any:
+        return (object,)
+    elif cls == float:
+        return (float, int)
+    elif cls == complex:
+        return (complex, float, int)
+    elif _ndarray_spec(cls):
+        return (sys.modules["numpy"].ndarray,)
+    elif origin := typing.get_origin(cls):
+        if origin == Literal:
+            return tuple(type(v) for v in cls.__args__)
+        elif origin in (Union, UnionType):
+            return tuple(t for ucls in cls.__args__ for t in _runtime_types(ucls))
+        elif origin == Annotated:
+            return _runtime_types(cls.__origin__)
+        return (origin,)
+    elif isinstance(cls, type):
+        return (cls,)
+    else:
+        return (object,)
+
+
+def _analyze_instance(cls, ctx):
+    """Return a predicate telling whether `x` is an instance of `cls`.
+
+    It tells apart the members of a union sharing a runtime type, for `_DispatchUnion`.
+    """
+    if typing.is_typeddict(cls) and cls not in ctx.implicit_conversions:
+        fields, required_key_set = _kwargs_fields(cls)
+        return _once(
+            _analyze_instance,
+            cls,
+            ctx,
+            lambda: functools.partial(
+                _is_typeddict,
+                frozenset(required_key_set),
+                {k: _analyze_instance(v, ctx) for k, v in fields.items()},
+            ),
+        )
+    origin = typing.get_origin(cls)
+    if origin == Literal:
+        return functools.partial(_is_literal, *_literal_index(cls.__args__))
+    elif origin in (Union, UnionType):
+        return functools.partial(
+            _is_any_of, tuple(_analyze_instance(ucls, ctx) for ucls in cls.__args__)
+        )
+    elif origin == Annotated:
+        return _analyze_instance(cls.__origin__, ctx)
+    elif origin == tuple and not (len(cls.__args__) == 2 and cls.__args__[1] == ...):
+        return functools.partial(
+            _is_tuple_of, tuple(_analyze_instance(vcls, ctx) for vcls in cls.__args__)
+        )
+    elif origin in (dict, collections.abc.Mapping, collections.abc.MutableMapping):
+        return functools.partial(
+            _is_dict_of,
+            origin,
+            _analyze_instance(cls.__args__[0], ctx),
+            _analyze_instance(cls.__args__[1], ctx),
+        )
+    elif origin in (
+        set,
+        collections.abc.Set,
+        collections.abc.MutableSet,
+        list,
+        collections.abc.Sequence,
+        collections.abc.MutableSequence,
+        collections.abc.Iterable,
+        collections.abc.Iterator,
+        collections.deque,
+        tuple,
+    ):
+        return functools.partial(
+            _is_collection_of, origin, _analyze_instance(cls.__args__[0], ctx)
+        )
+    return functools.partial(_is_instance, _runtime_types(cls))
+
+
+def _once(analyze, cls, ctx, build):
+    """Return `build()`, the plan of `analyze` for a dataclass, a TypedDict or a NamedTuple `cls`, building it once per analysis.
+
+    The plans built meanwhile, which reference `cls` recursively, receive a placeholder calling the final plan.
+    """
+    key = (analyze, cls)
+    try:
+        return ctx.plans[key]
+    except KeyError:
+        pass
+    cell = []
+    ctx.plans[key] = functools.partial(_analyze_deferred, cell)
+    plan = build()
+    cell.append(plan)
+    ctx.plans[key] = plan
+    return plan
+
+
+def _type_hints(cls):
+    """Resolve the annotations of `cls`, which may refer to `cls` itself."""
+    return typing.get_type_hints(cls, localns={cls.__name__: cls}, include_extras=True)
+
+
+_kwargs_fields_memo = weakref.WeakKeyDictionary()
+_kwargs_fields_lock = threading.Lock()
+
+
+def _kwargs_fields(cls):
+    """Return the field types and the required keys of a dataclass or a TypedDict.
+
+    The result is memoized for each class, and shared by every plan referencing it.
+    """
+    if not (dataclasses.is_dataclass(cls) or typing.is_typeddict(cls)):
+        return None
+    try:
+        with _kwargs_fields_lock:
+            return _kwargs_fields_memo[cls]
+    except KeyError:
+        kwargs_fields = _resolve_kwargs_fields(cls)
+        with _kwargs_fields_lock:
+            _kwargs_fields_memo[cls] = kwargs_fields
+        return kwargs_fields
+    except TypeError:
+        return _resolve_kwargs_fields(cls)
+
+
+def _resolve_kwargs_fields(cls):
+    hints = _type_hints(cls)
+    if dataclasses.is_dataclass(cls):
+        fields = dataclasses.fields(cls)
+        return (
+            {f.name: hints.get(f.name, f.type) for f in fields},
+            set(
+                f.name
+                for f in fields
+                if (f.default == dataclasses.MISSING)
+                and (f.default_factory == dataclasses.MISSING)
+            ),
+        )
+    required_key_set = set(cls.__required_keys__)
+    # With `from __future__ import annotations`, `typing` does not see the qualifiers.
+    for k, v in hints.items():
+        origin = typing.get_origin(v)
+        if origin in _qualifiers("Required"):
+            required_key_set.add(k)
+        elif origin in _qualifiers("NotRequired"):
+            required_key_set.discard(k)
+    types = {k: _strip_required(v) for k, v in hints.items()}
+    return types, required_key_set
+
+
+def _qualifiers(name):
+    return tuple(
+        getattr(module, name)
+        for module in (typing, sys.modules.get("typing_extensions"))
+        if hasattr(module, name)
+    )
+
+
+def _strip_required(cls):
+    """Remove the `Required` and `NotRequired` qualifiers of a TypedDict item type."""
+    qualifiers = _qualifiers("Required") + _qualifiers("NotRequired")
+    while typing.get_origin(cls) in qualifiers:
+        cls = typing.get_args(cls)[0]
+    return cls
+
+
+def _analyze_kwargs(cls, fields, required_key_set, call_cls, ctx):
+    direct = (
+        _direct_construction(cls)
+        if call_cls and ctx.construct == "direct" and not ctx.validate
+        else None
+    )
+    if ctx.backend == "codegen":
+        return _generate_cast_kwargs(
+            cls, fields, required_key_set, call_cls, ctx.validate, direct
+        )
+    if direct is not None:
+        return functools.partial(
+            _cast_kwargs_direct, cls, fields, required_key_set, *direct
+        )
+    return functools.partial(
+        _check_kwargs if ctx.validate else _cast_kwargs, cls, fields, required_key_set
+    )
+
+
+def _direct_construction(cls):
+    """Return `(defaults, factories, setattr_)` for `_cast_kwargs_direct`, or `None`.
+
+    `None` means that `cls` has to be constructed by its `__init__`.
+    """
+    params = cls.__dataclass_params__
+    fields = dataclasses.fields(cls)
+    if (
+        not params.init
+        or hasattr(cls, "__post_init__")
+        or cls.__new__ is not object.__new__
+        or not (params.frozen or cls.__setattr__ is object.__setattr__)
+        or not all(f.init for f in fields)
+    ):
+        return None
+    init = cls.__init__
+    code = getattr(init, "__code__", None)
+    if (
+        code is None
+        or code.co_filename != "<string>"
+        or init.__qualname__ != f"{cls.__qualname__}.__init__"
+    ):
+        # Not the `__init__` generated by `dataclasses`.
+        return None
+    # `InitVar`s show up as a mismatch of the parameters.
+    parameters = tuple(inspect.signature(init).parameters)
+    if parameters != ("self", *(f.name for f in fields)):
+        return None
+    return (
+        {f.name: f.default for f in fields if f.default is not dataclasses.MISSING},
+        {
+            f.name: f.default_factory
+            for f in fields
+            if f.default_factory is not dataclasses.MISSING
+        },
+        any("__slots__" in vars(c) for c in cls.__mro__)
+        or any(_is_data_descriptor(cls, f.name) for f in fields),
+    )
+
+
+def _is_data_descriptor(cls, name):
+    for c in cls.__mro__:
+        if name in vars(c):
+            t = type(vars(c)[name])
+            return hasattr(t, "__set__") or hasattr(t, "__delete__")
+    return False
+
+
+def _split_merge(cls, ctx):
+    """Return the merger of the chunks of `Caster.parallel`, or `None`."""
+    if cls in ctx.implicit_conversions:
+        return None
+    origin = typing.get_origin(cls)
+    if origin in (list, collections.abc.Sequence, collections.abc.MutableSequence):
+        return functools.partial(_merge_chunks, list)
+    elif origin in (set, collections.abc.Set, collections.abc.MutableSet):
+        return functools.partial(_merge_chunks, set)
+    elif origin == collections.deque:
+        return functools.partial(_merge_chunks, collections.deque)
+    elif origin == tuple and len(cls.__args__) == 2 and cls.__args__[1] == ...:
+        return functools.partial(_merge_chunks, tuple)
+    elif origin in (dict, collections.abc.Mapping, collections.abc.MutableMapping):
+        return _merge_dicts
+    else:
+        return None
+
+
+def _analyze_union(cls, ctx):
+    uclss = cls.__args__
+    tags = [_literal_tags(ucls, ctx) for ucls in uclss]
+    counts = collections.Counter(key for tag in tags for key in tag)
+    tag_key = max(counts, key=counts.__getitem__) if counts else None
+    members = []
+    for ucls, tag in zip(uclss, tags):
+        kwargs_fields = (
+            None if ucls in ctx.implicit_conversions else _kwargs_fields(ucls)
+        )
+        members.append(
+            _UnionMember(
+                ctx.instrument(
+                    f"{_label(cls)} -> {_label(ucls)}", _analyze_union_member(ucls, ctx)
+                ),
+                _input_types(ucls, ctx),
+                kwargs_fields
+                and (frozenset(kwargs_fields[1]), frozenset(kwargs_fields[0])),
+                tag,
+            )
+        )
+    return functools.partial(
+        _analyze_ScreenedUnion, str(cls), _UnionScreen(tuple(members), tag_key)
+    )
+
+
+def _analyze_union_member(cls, ctx):
+    """Analyze a member of a union.
+
+    `Iterable[T]` and `Iterator[T]` members are cast eagerly, since a lazy member could never fail over to the next one.
+    """
+    if (
+        not ctx.validate
+        and cls not in ctx.implicit_conversions
+        and typing.get_origin(cls)
+        in (collections.abc.Iterable, collections.abc.Iterator)
+    ):
+        return functools.partial(
+            _analyze_eager_iterator, str(cls), _analyze(cls.__args__[0], ctx)
+        )
+    return _analyze(cls, ctx)
+
+
+def _input_types(cls, ctx):
+    """Return a predicate of the input types of `cls`, or `None` for any."""
+    if cls in ctx.implicit_conversions or cls == Any:
+        return None
+    elif _kwargs_fields(cls):
+        return functools.partial(_issubclass_of, dict)
+    elif cls == decimal.Decimal:
+        return functools.partial(_issubclass_of, (str, int, float))
+    elif _is_namedtuple(cls):
+        return functools.partial(_issubclass_of, (dict, list, tuple))
+    elif isinstance(cls, enum.EnumMeta):
+        if _defines_missing(cls):
+            return None
+        types = {cls, *(type(m.value) for m in cls)}
+        if any(issubclass(t, numbers.Number) for t in types):
+            # Members are looked up by equality, which matches numbers of any type.
+            types.add(numbers.Number)
+        if ctx.enum_names:
+            types.add(str)
+        return functools.partial(_issubclass_of, tuple(types))
+    elif cls == complex:
+        return functools.partial(
+            _is_number_type,
+            (int, float, complex),
+            ("integer", "floating", "complexfloating"),
+        )
+    elif cls == float:
+        return functools.partial(_is_number_type, (int, float), ("integer", "floating"))
+    elif cls == int:
+        return functools.partial(_is_number_type, int, ("integer",))
+    elif _ndarray_spec(cls):
+        return None
+    elif origin := typing.get_origin(cls):
+        if origin in (
+            set,
+            collections.abc.Set,
+            collections.abc.MutableSet,
+            list,
+            collections.abc.Sequence,
+            collections.abc.MutableSequence,
+            collections.abc.Iterable,
+            collections.abc.Iterator,
+            collections.deque,
+            tuple,
+        ):
+            return functools.partial(_has_attr, "__iter__")
+        elif origin in (
+            dict,
+            collections.abc.Mapping,
+            collections.abc.MutableMapping,
+        ):
+            return functools.partial(_has_attr, "items")
+        elif origin == Annotated:
+            if cls.__origin__ == array.array:
+                return functools.partial(_has_attr, "__iter__")
+            return _input_types(cls.__origin__, ctx)
+        elif origin in (Union, UnionType):
+            predicates = [_input_types(ucls, ctx) for ucls in cls.__args__]
+            if any(predicate is None for predicate in predicates):
+                return None
+            return functools.partial(_any_of, tuple(predicates))
+        else:
+            return None
+    elif type(cls) is type:
+        return functools.partial(_issubclass_of, cls)
+    else:
+        return None
+
+
+def _issubclass_of(cls, t):
+    return issubclass(t, cls)
+
+
+def _has_attr(name, t):
+    return hasattr(t, name)
+
+
+def _any_of(predicates, t):
+    return any(predicate(t) for predicate in predicates)
+
+
+def _literal_tags(cls, ctx):
+    """Return `{key: _literal_index(values)[0]}` for the required Literal fields of `cls`.
+
+    `cls` is a dataclass or a TypedDict; Literals with unhashable values are skipped.
+    """
+    if cls in ctx.implicit_conversions:
+        return {}
+    kwargs_fields = _kwargs_fields(cls)
+    if not kwargs_fields:
+        return {}
+    types, required_key_set = kwargs_fields
+    tags = {}
+    for k in required_key_set:
+        vcls = types[k]
+        if typing.get_origin(vcls) == Literal and vcls not in ctx.implicit_conversions:
+            index, unhashable = _literal_index(vcls.__args__)
+            if not unhashable:
+                tags[k] = index
+    return tags
@@ -3,6 +3,7 @@ import dataclasses
 import decimal
 import functools
 import typing
+import weakref
 from typing import Any, Literal, Union
 
 from .._common import (
@@ -29,6 +30,7 @@ from .._common import (
     _CallWithInspect,
     _cast_kwargs,
     _identity1,
+    _literal_index,
     override,
 )
 
@@ -99,10 +101,13 @@ def _analyze(cls, implicit_conversions):
                 str(cls),
                 _analyze,
                 implicit_conversions,
+                weakref.WeakKeyDictionary(),
                 _analyze(GetAttr[path], implicit_conversions),
             )
         elif origin == Literal:
-            return functools.partial(_analyze_Literal, str(cls), cls.__args__)
+            return functools.partial(
+                _analyze_Literal, str(cls), *_literal_index(cls.__args__)
+            )
         elif origin in (
             set,
             collections.abc.Set,